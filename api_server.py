@@ -0,0 +1,221 @@
+"""Headless HTTP inference service
+
+Serves the same preprocessing and model as the Streamlit app, kept resident
+in one process, using only the standard library HTTP server:
+
+    python api_server.py --host 0.0.0.0 --port 8000
+
+With ``--max-wait-ms`` above zero, concurrent single-order requests are
+micro-batched into one vectorized call (see utils.micro_batcher).
+
+Endpoints:
+    GET  /health          model status and version
+    GET  /metrics         Prometheus metrics (see utils.metrics)
+    POST /predict         one order (JSON object) or a list of orders
+    POST /predict/batch   a list of orders, scored in one vectorized call
+"""
+import argparse
+import json
+import math
+import os
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pandas as pd
+
+from utils.data_handler import (
+    load_models, predict_frame, predict_with_cache, get_model_version, REQUIRED_COLUMNS
+)
+from utils.micro_batcher import MicroBatcher
+from utils.metrics import REGISTRY, PREDICTIONS, CONTENT_TYPE as METRICS_CONTENT_TYPE
+
+# Largest request body accepted, in bytes
+MAX_BODY_BYTES = 64 * 1024 * 1024
+
+
+class InferenceService:
+    """Resident model plus the prediction entry points used by the HTTP handler"""
+
+    def __init__(self, encoder, scaler, model, batcher=None):
+        self.encoder = encoder
+        self.scaler = scaler
+        self.model = model
+        self.model_version = get_model_version(model)
+        self.started_at = time.time()
+        self.batcher = batcher
+
+    def enable_micro_batching(self, max_batch_size, max_wait_ms):
+        """Route single-order requests through a MicroBatcher on a background loop"""
+        self.batcher = MicroBatcher(self.predict_many, max_batch_size, max_wait_ms)
+        self.batcher.start_in_thread()
+
+    def _check_orders(self, orders):
+        """Ensure orders is a list of objects carrying every required field"""
+        if not isinstance(orders, list) or not all(isinstance(order, dict) for order in orders):
+            raise ValueError("Expected a JSON object or an array of JSON objects")
+        for order in orders:
+            missing_columns = [col for col in REQUIRED_COLUMNS if col not in order]
+            if missing_columns:
+                raise ValueError(f"Missing columns: {missing_columns}")
+
+    def predict_one(self, order):
+        """Score a single order, micro-batched when enabled and cached otherwise"""
+        self._check_orders([order])
+        if self.batcher is not None:
+            result = self.batcher.submit_threadsafe(order)
+            if 'error' in result:
+                raise ValueError(result['error'])
+            return result
+
+        frame = pd.DataFrame([order])
+        prediction, (lower, upper) = predict_with_cache(frame, self.encoder, self.scaler, self.model)
+        return {'prediction': prediction, 'lower': lower, 'upper': upper}
+
+    def predict_many(self, orders):
+        """Score a list of orders in one vectorized call"""
+        self._check_orders(orders)
+        if not orders:
+            return []
+        frame = pd.DataFrame(orders)
+        PREDICTIONS.inc(len(orders), kind="api")
+
+        results = predict_frame(frame, self.encoder, self.scaler, self.model, include_confidence=True)
+        response = []
+        for prediction, lower, upper in zip(results['Predicted_Delivery_Time'],
+                                            results['Confidence_Lower'],
+                                            results['Confidence_Upper']):
+            if isinstance(prediction, str):
+                # predict_frame marks failed rows "Error: <reason>"; the error field carries the reason
+                response.append({'error': prediction.removeprefix("Error: ")})
+            else:
+                response.append({
+                    'prediction': float(prediction),
+                    'lower': None if math.isnan(lower) else float(lower),
+                    'upper': None if math.isnan(upper) else float(upper)
+                })
+        return response
+
+    def health(self):
+        status = {
+            'status': 'ok',
+            'model_version': self.model_version,
+            'uptime_seconds': time.time() - self.started_at
+        }
+        if self.batcher is not None:
+            status['micro_batching'] = self.batcher.stats()
+        return status
+
+
+class PredictionRequestHandler(BaseHTTPRequestHandler):
+    """Routes JSON requests to the InferenceService attached to the server"""
+
+    protocol_version = "HTTP/1.1"
+
+    def _send_json(self, status, payload):
+        self._send_text(status, json.dumps(payload), "application/json")
+
+    def _read_json(self):
+        header = self.headers.get("Content-Length") or "0"
+        try:
+            length = int(header)
+        except ValueError:
+            length = -1
+        # A rejected body is left unread, so the connection cannot carry another request
+        if length < 0:
+            self.close_connection = True
+            raise ValueError(f"Invalid Content-Length: {header!r}")
+        if length > MAX_BODY_BYTES:
+            self.close_connection = True
+            raise ValueError(f"Request body larger than {MAX_BODY_BYTES} bytes")
+        return json.loads(self.rfile.read(length) or b"null")
+
+    def _send_text(self, status, text, content_type):
+        body = text.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        if self.close_connection:
+            self.send_header("Connection", "close")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send_json(200, self.server.service.health())
+        elif self.path == "/metrics":
+            self._send_text(200, REGISTRY.render(), METRICS_CONTENT_TYPE)
+        else:
+            self._send_json(404, {'error': f"Unknown endpoint: {self.path}"})
+
+    def do_POST(self):
+        service = self.server.service
+        try:
+            payload = self._read_json()
+            if self.path == "/predict":
+                if isinstance(payload, dict):
+                    self._send_json(200, service.predict_one(payload))
+                else:
+                    self._send_json(200, {'predictions': service.predict_many(payload)})
+            elif self.path == "/predict/batch":
+                self._send_json(200, {'predictions': service.predict_many(payload)})
+            else:
+                self._send_json(404, {'error': f"Unknown endpoint: {self.path}"})
+        except ValueError as e:
+            # Also covers malformed JSON (json.JSONDecodeError is a ValueError)
+            self._send_json(400, {'error': str(e)})
+        except Exception as e:
+            self._send_json(500, {'error': f"Prediction failed: {str(e)}"})
+
+    def log_message(self, format, *args):
+        # Per-request access logs would dominate output at hundreds of requests per second
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class PredictionServer(ThreadingHTTPServer):
+    """Threaded HTTP server with a listen backlog sized for bursts of clients"""
+
+    daemon_threads = True
+    # socketserver's default backlog of 5 resets connections under concurrent load
+    request_queue_size = 1024
+
+
+def create_server(host, port, service, verbose=False):
+    """Create a threaded HTTP server bound to the given service"""
+    server = PredictionServer((host, port), PredictionRequestHandler)
+    server.service = service
+    server.verbose = verbose
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Delivery time prediction HTTP service")
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to bind (default 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8000, help="Port to listen on (default 8000)")
+    parser.add_argument("--model-dir", default=os.path.dirname(os.path.abspath(__file__)),
+                        help="Directory holding encoder.pkl, scaler.pkl and the model")
+    parser.add_argument("--max-wait-ms", type=float, default=0.0,
+                        help="Micro-batch single orders, waiting up to this long for others (0 disables)")
+    parser.add_argument("--max-batch-size", type=int, default=64,
+                        help="Largest micro-batch scored in one call (default 64)")
+    parser.add_argument("--verbose", action="store_true", help="Log every request")
+    args = parser.parse_args(argv)
+
+    # load_models resolves artifacts relative to the working directory
+    os.chdir(args.model_dir)
+    service = InferenceService(*load_models())
+    if args.max_wait_ms > 0:
+        service.enable_micro_batching(args.max_batch_size, args.max_wait_ms)
+
+    server = create_server(args.host, args.port, service, args.verbose)
+    print(f"Serving predictions on http://{args.host}:{args.port} (model {service.model_version})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,335 @@
+"""Benchmarks for the prediction hot paths
+
+Runs offline against the shipped encoder.pkl / scaler.pkl and a forest trained
+on generated orders, and writes latency percentiles, rows/sec and peak traced
+memory for each (stage, input size) to a JSON file so runs can be compared:
+
+    python benchmarks/run_benchmarks.py
+    python benchmarks/run_benchmarks.py --sizes 1,100 --trees 500 --output before.json
+    python benchmarks/run_benchmarks.py --sizes 1,100 --trees 500 --compare before.json
+
+``--cutover`` instead times ``predict`` of the compiled forest against the
+sklearn estimator over a range of input sizes and reports the row count from
+which sklearn is faster (the COMPACT_FOREST_MAX_ROWS routing threshold):
+
+    python benchmarks/run_benchmarks.py --cutover
+
+``--workers`` times batch scoring of one large frame in-process and across
+process pools of each given size (the "Worker Processes" batch option),
+cold (including pool start-up) and warm, so the pool can be checked to
+actually beat the single-process path on the target host:
+
+    python benchmarks/run_benchmarks.py --workers 1,2,4 --sizes 200000
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+import warnings
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from utils.data_handler import (  # noqa: E402
+    prepare_input_data, make_prediction, predict_frame, process_batch_data, CAT_COLS, REQUIRED_COLUMNS
+)
+from utils.analytics import calculate_confidence_interval, predict_with_uncertainty  # noqa: E402
+from utils.compact_forest import CompactForest, HybridForest, compile_forest  # noqa: E402
+from utils.parallel_scoring import ParallelScorer  # noqa: E402
+
+DEFAULT_SIZES = [1, 100, 10000, 1000000]
+
+# Input sizes timed by --cutover
+CUTOVER_SIZES = [1, 10, 100, 300, 1000, 3000, 10000, 30000, 100000]
+
+# Frame size timed by --workers unless --sizes is given
+WORKER_SCALING_ROWS = 200000
+
+# Spend roughly this many row-evaluations per case when choosing repeat counts
+ROW_BUDGET = 200000
+
+
+def generate_orders(encoder, n_rows, seed=0):
+    """Generate n_rows of plausible orders using the encoder's known categories"""
+    rng = np.random.default_rng(seed)
+    data = {
+        'Delivery_person_Age': rng.integers(21, 51, n_rows),
+        'Delivery_person_Ratings': rng.uniform(1, 5, n_rows).round(1),
+        'Vehicle_condition': rng.integers(0, 3, n_rows),
+        'multiple_deliveries': rng.integers(0, 4, n_rows),
+        'distance_km': rng.uniform(1, 25, n_rows).round(2),
+        'prep_time_min': rng.integers(5, 21, n_rows),
+        'order_hour': rng.integers(7, 24, n_rows),
+        'order_day': rng.integers(0, 7, n_rows),
+        'is_weekend': rng.integers(0, 2, n_rows)
+    }
+    for col, categories in zip(CAT_COLS, encoder.categories_):
+        # Title-case labels, as the UI and uploads provide them
+        data[col] = rng.choice([str(category).strip().title() for category in categories], n_rows)
+    return pd.DataFrame(data)[REQUIRED_COLUMNS]
+
+
+def train_forest(encoder, scaler, n_trees, max_depth, n_rows=20000, seed=0):
+    """Fit a RandomForestRegressor on generated orders with a synthetic target"""
+    from sklearn.ensemble import RandomForestRegressor
+
+    orders = generate_orders(encoder, n_rows, seed)
+    X = prepare_input_data(orders, encoder, scaler)
+    rng = np.random.default_rng(seed)
+    y = (
+        12 + 1.8 * orders['distance_km'] + 0.6 * orders['prep_time_min']
+        + 4 * orders['multiple_deliveries'] + rng.normal(0, 3, n_rows)
+    ).to_numpy()
+    model = RandomForestRegressor(n_estimators=n_trees, max_depth=max_depth, random_state=seed, n_jobs=-1)
+    return model.fit(X, y)
+
+
+def time_case(func, repeats):
+    """Return per-call latencies in seconds"""
+    func()  # warm-up
+    latencies = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        latencies.append(time.perf_counter() - start)
+    return np.array(latencies)
+
+
+def peak_memory(func):
+    """Return the peak traced allocation of one call, in MB"""
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak / (1024 * 1024)
+
+
+def build_cases(orders, encoder, scaler, model):
+    """Return (stage, callable) pairs for one input frame"""
+    final_input = prepare_input_data(orders, encoder, scaler)
+    csv_text = orders.to_csv(index=False)
+
+    cases = [
+        ('prepare_input_data', lambda: prepare_input_data(orders, encoder, scaler)),
+        ('model_predict', lambda: model.predict(final_input)),
+        ('predict_with_uncertainty', lambda: predict_with_uncertainty(model, final_input)),
+        ('process_batch_data', lambda: process_batch_data(io.StringIO(csv_text), encoder, scaler, model))
+    ]
+    if len(orders) == 1:
+        cases += [
+            ('make_prediction', lambda: make_prediction(model, final_input)),
+            ('calculate_confidence_interval', lambda: calculate_confidence_interval(model, final_input))
+        ]
+    return cases
+
+
+def run(sizes, n_trees, max_depth, engine, measure_memory=True):
+    import joblib
+
+    encoder = joblib.load(os.path.join(REPO_ROOT, "encoder.pkl"))
+    scaler = joblib.load(os.path.join(REPO_ROOT, "scaler.pkl"))
+
+    start = time.perf_counter()
+    model = train_forest(encoder, scaler, n_trees, max_depth)
+    train_seconds = time.perf_counter() - start
+    if engine == "compact":
+        model = compile_forest(model)
+    elif engine == "hybrid":
+        model = HybridForest(compile_forest(model), model)
+
+    results = []
+    for n_rows in sizes:
+        orders = generate_orders(encoder, n_rows, seed=n_rows)
+        repeats = int(min(200, max(3, ROW_BUDGET // n_rows)))
+        for stage, func in build_cases(orders, encoder, scaler, model):
+            latencies = time_case(func, repeats)
+            result = {
+                'stage': stage,
+                'rows': n_rows,
+                'repeats': repeats,
+                'p50_ms': float(np.percentile(latencies, 50) * 1000),
+                'p90_ms': float(np.percentile(latencies, 90) * 1000),
+                'p99_ms': float(np.percentile(latencies, 99) * 1000),
+                'mean_ms': float(latencies.mean() * 1000),
+                'rows_per_sec': float(n_rows / np.median(latencies)),
+                'peak_memory_mb': peak_memory(func) if measure_memory else None
+            }
+            results.append(result)
+            print(f"{stage:<30} rows={n_rows:<8} p50={result['p50_ms']:10.3f} ms "
+                  f"p99={result['p99_ms']:10.3f} ms  {result['rows_per_sec']:14,.0f} rows/s", flush=True)
+
+    return {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'forest': {'n_trees': n_trees, 'max_depth': max_depth, 'engine': engine,
+                   'train_seconds': train_seconds},
+        'results': results
+    }
+
+
+def measure_cutover(sizes, n_trees, max_depth):
+    """Time compiled vs sklearn predict per input size; returns the report dict
+
+    ``cutover_rows`` is the smallest measured size from which sklearn stays
+    faster, or None if the compiled forest wins everywhere.
+    """
+    import joblib
+
+    encoder = joblib.load(os.path.join(REPO_ROOT, "encoder.pkl"))
+    scaler = joblib.load(os.path.join(REPO_ROOT, "scaler.pkl"))
+    estimator = train_forest(encoder, scaler, n_trees, max_depth)
+    forest = CompactForest.from_sklearn(estimator)
+
+    results = []
+    for n_rows in sizes:
+        final_input = prepare_input_data(generate_orders(encoder, n_rows, seed=n_rows), encoder, scaler)
+        repeats = int(min(200, max(3, ROW_BUDGET // n_rows)))
+        compact_ms = np.median(time_case(lambda: forest.predict(final_input), repeats)) * 1000
+        sklearn_ms = np.median(time_case(lambda: estimator.predict(final_input), repeats)) * 1000
+        results.append({'rows': n_rows, 'compact_p50_ms': float(compact_ms), 'sklearn_p50_ms': float(sklearn_ms)})
+        print(f"rows={n_rows:<8} compact={compact_ms:10.3f} ms  sklearn={sklearn_ms:10.3f} ms  "
+              f"{'compact' if compact_ms <= sklearn_ms else 'sklearn'} wins", flush=True)
+
+    cutover = None
+    for result in reversed(results):
+        if result['sklearn_p50_ms'] >= result['compact_p50_ms']:
+            break
+        cutover = result['rows']
+    print(f"Route inputs of {cutover} rows or more to sklearn" if cutover else "Compiled forest wins at every size")
+
+    return {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'forest': {'n_trees': n_trees, 'max_depth': max_depth},
+        'cutover_rows': cutover,
+        'results': results
+    }
+
+
+def measure_worker_scaling(worker_counts, n_rows, n_trees, max_depth, repeats=3):
+    """Time scoring one frame in-process and across process pools; returns the report dict
+
+    The model is set up as load_models does: a HybridForest whose estimator
+    is saved to a joblib file that workers memory-map. One worker scores in
+    this process. For pools, ``cold_s`` covers starting the pool (workers
+    import the app and load the estimator) plus the first call, as one
+    batch upload pays it; ``warm_s`` is the median of later calls.
+    """
+    import joblib
+
+    encoder = joblib.load(os.path.join(REPO_ROOT, "encoder.pkl"))
+    scaler = joblib.load(os.path.join(REPO_ROOT, "scaler.pkl"))
+    estimator = train_forest(encoder, scaler, n_trees, max_depth)
+    orders = generate_orders(encoder, n_rows, seed=n_rows)
+
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        estimator_path = os.path.join(directory, "rf_model.pkl")
+        joblib.dump(estimator, estimator_path)
+        model = HybridForest(CompactForest.from_sklearn(estimator), estimator, estimator_path=estimator_path)
+        for n_workers in worker_counts:
+            if n_workers <= 1:
+                latencies = time_case(lambda: predict_frame(orders, encoder, scaler, model), repeats)
+                cold = warm = float(np.median(latencies))
+            else:
+                start = time.perf_counter()
+                with ParallelScorer(encoder, scaler, model, n_workers) as scorer:
+                    scorer.predict_frame(orders)
+                    cold = time.perf_counter() - start
+                    warm = float(np.median(time_case(lambda: scorer.predict_frame(orders), repeats)))
+            results.append({'workers': n_workers, 'rows': n_rows, 'cold_s': cold, 'warm_s': warm,
+                            'warm_rows_per_sec': n_rows / warm})
+            print(f"workers={n_workers:<3} rows={n_rows:<8} cold={cold:8.3f} s  warm={warm:8.3f} s  "
+                  f"{n_rows / warm:12,.0f} rows/s  {results[0]['warm_s'] / warm:5.2f}x warm, "
+                  f"{results[0]['cold_s'] / cold:5.2f}x cold vs {worker_counts[0]} worker(s)", flush=True)
+
+    return {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'forest': {'n_trees': n_trees, 'max_depth': max_depth},
+        'results': results
+    }
+
+
+def compare(baseline, current):
+    """Print p50 latency of current vs baseline for every shared (stage, rows) case"""
+    baseline_cases = {(r['stage'], r['rows']): r for r in baseline['results']}
+    print(f"{'stage':<30} {'rows':>8} {'base p50 ms':>12} {'new p50 ms':>12} {'speedup':>8}")
+    for result in current['results']:
+        before = baseline_cases.get((result['stage'], result['rows']))
+        if before is None:
+            continue
+        speedup = before['p50_ms'] / result['p50_ms'] if result['p50_ms'] else float('inf')
+        print(f"{result['stage']:<30} {result['rows']:>8} {before['p50_ms']:>12.3f} "
+              f"{result['p50_ms']:>12.3f} {speedup:>7.2f}x")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the prediction hot paths")
+    parser.add_argument("--sizes", default=",".join(str(size) for size in DEFAULT_SIZES),
+                        help="Comma-separated input sizes in rows (default 1,100,10000,1000000)")
+    parser.add_argument("--trees", type=int, default=100, help="Trees in the generated forest")
+    parser.add_argument("--max-depth", type=int, default=None, help="Max depth of the generated forest")
+    parser.add_argument("--engine", choices=["hybrid", "compact", "sklearn"], default="hybrid",
+                        help="Evaluate through the size-routed forest (as the app does), "
+                             "only the compiled forest, or only sklearn")
+    parser.add_argument("--no-memory", action="store_true", help="Skip the traced peak-memory pass")
+    parser.add_argument("--cutover", action="store_true",
+                        help="Measure the input size from which sklearn beats the compiled forest")
+    parser.add_argument("--workers", default=None,
+                        help="Comma-separated worker counts; time batch scoring across process pools")
+    parser.add_argument("--compare", default=None, help="Earlier results file to compare against")
+    parser.add_argument("--output", default=None,
+                        help="Results file (default benchmarks/results/<timestamp>.json)")
+    args = parser.parse_args(argv)
+
+    warnings.filterwarnings("ignore", category=UserWarning)
+    if args.cutover:
+        sizes = CUTOVER_SIZES if args.sizes == parser.get_default("sizes") else \
+            [int(size) for size in args.sizes.split(",") if size]
+        report = measure_cutover(sizes, args.trees, args.max_depth)
+    elif args.workers:
+        n_rows = WORKER_SCALING_ROWS if args.sizes == parser.get_default("sizes") else int(args.sizes.split(",")[0])
+        report = measure_worker_scaling([int(count) for count in args.workers.split(",") if count],
+                                        n_rows, args.trees, args.max_depth)
+    else:
+        sizes = [int(size) for size in args.sizes.split(",") if size]
+        report = run(sizes, args.trees, args.max_depth, args.engine, not args.no_memory)
+
+    output = args.output
+    if output is None:
+        results_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+        os.makedirs(results_dir, exist_ok=True)
+        output = os.path.join(results_dir, datetime.now().strftime("%Y%m%d-%H%M%S") + ".json")
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}")
+
+    if args.compare and not (args.cutover or args.workers):
+        with open(args.compare, "r", encoding="utf-8") as f:
+            compare(json.load(f), report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""Latency versus error of fast-mode tree budgets
+
+Scores a holdout sample with the first n trees of a forest and reports, per
+budget, single-order latency (prediction plus interval, as the Single
+Prediction tab computes it) and the deviation from the full forest:
+
+    python benchmarks/tree_budget.py
+    python benchmarks/tree_budget.py --model rf_model.pkl --budgets 10,50,100,500
+    python benchmarks/tree_budget.py --output benchmarks/tree_budget_report.md
+"""
+import argparse
+import os
+import platform
+import sys
+import warnings
+from datetime import datetime
+
+import numpy as np
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from run_benchmarks import generate_orders, train_forest, time_case  # noqa: E402
+from utils.data_handler import prepare_input_data  # noqa: E402
+from utils.analytics import predict_with_uncertainty  # noqa: E402
+from utils.compact_forest import compile_forest  # noqa: E402
+
+DEFAULT_BUDGETS = [10, 25, 50, 100, 200, 500]
+
+
+def measure(model, holdout, budgets, repeats=200):
+    """Return one result dict per tree budget; the last budget is compared as-is"""
+    n_total = model.n_estimators
+    full = model.predict(holdout)
+    full_interval = predict_with_uncertainty(model, holdout)
+    single = holdout[:1]
+
+    results = []
+    for n_trees in sorted({min(budget, n_total) for budget in budgets}):
+        estimate = model.predict(holdout, n_trees=n_trees)
+        interval = predict_with_uncertainty(model, holdout, n_trees=n_trees)
+        error = np.abs(estimate - full)
+        relative = error / np.maximum(np.abs(full), 1e-12)
+        width_error = np.abs((interval['upper'] - interval['lower'])
+                             - (full_interval['upper'] - full_interval['lower']))
+        latencies = time_case(lambda: predict_with_uncertainty(model, single, n_trees=n_trees), repeats)
+        results.append({
+            'n_trees': n_trees,
+            'p50_ms': float(np.percentile(latencies, 50) * 1000),
+            'p99_ms': float(np.percentile(latencies, 99) * 1000),
+            'mae_min': float(error.mean()),
+            'p95_abs_error_min': float(np.percentile(error, 95)),
+            'max_abs_error_min': float(error.max()),
+            'mean_rel_error_pct': float(relative.mean() * 100),
+            'interval_width_mae_min': float(width_error.mean())
+        })
+    return results
+
+
+def format_report(results, description):
+    lines = [
+        "# Fast-mode tree budget: latency vs error",
+        "",
+        description,
+        "",
+        "Errors are relative to the full forest on the same holdout rows (minutes).",
+        "Latency is one order scored with its confidence interval.",
+        "",
+        "| trees | p50 ms | p99 ms | MAE | p95 abs err | max abs err | mean rel err % | interval width MAE |",
+        "|------:|-------:|-------:|----:|------------:|------------:|---------------:|-------------------:|"
+    ]
+    for r in results:
+        lines.append(
+            f"| {r['n_trees']} | {r['p50_ms']:.3f} | {r['p99_ms']:.3f} | {r['mae_min']:.3f} | "
+            f"{r['p95_abs_error_min']:.3f} | {r['max_abs_error_min']:.3f} | "
+            f"{r['mean_rel_error_pct']:.2f} | {r['interval_width_mae_min']:.3f} |"
+        )
+    return "\n".join(lines) + "\n"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure latency vs error of fast-mode tree budgets")
+    parser.add_argument("--model", default=None,
+                        help="Pickled forest or forest directory (default: train one on generated orders)")
+    parser.add_argument("--trees", type=int, default=500, help="Trees in the generated forest")
+    parser.add_argument("--max-depth", type=int, default=None, help="Max depth of the generated forest")
+    parser.add_argument("--budgets", default=",".join(str(b) for b in DEFAULT_BUDGETS),
+                        help="Comma-separated tree budgets to evaluate")
+    parser.add_argument("--holdout", type=int, default=5000, help="Holdout rows")
+    parser.add_argument("--output", default=None, help="Write the markdown report to this file")
+    args = parser.parse_args(argv)
+
+    import joblib
+    from utils.model_store import is_forest_dir, load_forest
+
+    warnings.filterwarnings("ignore", category=UserWarning)
+    encoder = joblib.load(os.path.join(REPO_ROOT, "encoder.pkl"))
+    scaler = joblib.load(os.path.join(REPO_ROOT, "scaler.pkl"))
+
+    if args.model is None:
+        model = compile_forest(train_forest(encoder, scaler, args.trees, args.max_depth))
+        source = (f"Forest of {args.trees} trees (max_depth={args.max_depth}) trained on "
+                  f"generated orders with a synthetic target")
+    elif is_forest_dir(args.model):
+        model = load_forest(args.model)
+        source = f"Forest loaded from {os.path.basename(args.model)}"
+    else:
+        model = compile_forest(joblib.load(args.model))
+        source = f"Forest loaded from {os.path.basename(args.model)}"
+
+    # Seed differs from the training sample, so these rows are unseen
+    holdout = prepare_input_data(generate_orders(encoder, args.holdout, seed=12345), encoder, scaler)
+    budgets = [int(budget) for budget in args.budgets.split(",") if budget]
+    results = measure(model, holdout, budgets)
+
+    description = (
+        f"{source}; {args.holdout} holdout rows. Measured {datetime.now():%Y-%m-%d} on "
+        f"Python {platform.python_version()}, {os.cpu_count()} CPU(s)."
+    )
+    report = format_report(results, description)
+    print(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(report)
+
+
+if __name__ == "__main__":
+    main()
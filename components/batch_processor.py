@@ -1,16 +1,38 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-from utils.data_handler import process_batch_data, create_sample_batch_data
+from utils.data_handler import (
+    process_batch_data, process_batch_stream, create_sample_batch_data,
+    REQUIRED_COLUMNS, DEFAULT_CHUNK_SIZE
+)
+from utils.batch_io import FORMAT_EXTENSIONS, MIME_TYPES, detect_format, iter_batches, batch_to_bytes
 from utils.visualizations import create_batch_analysis_chart
+from utils.metrics import BATCH_LATENCY
 import base64
+import os
+import tempfile
 from io import StringIO
 
+def get_batch_output_dir():
+    """Return this session's directory for streamed results"""
+    # Held in session state, the directory and its contents are removed when
+    # the session ends (or at interpreter exit)
+    if st.session_state.get('batch_output_dir') is None:
+        st.session_state.batch_output_dir = tempfile.TemporaryDirectory(prefix="batch_results_")
+    return st.session_state.batch_output_dir.name
+
+def discard_batch_output():
+    """Delete the session's previous streamed results file, if any"""
+    path = st.session_state.get('batch_output_path')
+    if path and os.path.exists(path):
+        os.remove(path)
+    st.session_state.batch_output_path = None
+
 def render_batch_processor(encoder, scaler, model):
     """Render the batch processing interface"""
     
     st.markdown("### 📊 Batch Processing")
-    st.info("Upload a CSV file with multiple orders for batch prediction")
+    st.info("Upload a CSV, Parquet or Arrow file with multiple orders for batch prediction")
     
     # Create two columns
     col1, col2 = st.columns([1, 1])
@@ -20,9 +42,10 @@ def render_batch_processor(encoder, scaler, model):
         
         # File upload
         uploaded_file = st.file_uploader(
-            "Choose a CSV file",
-            type="csv",
-            help="Upload a CSV file with delivery order data"
+            "Choose a batch file",
+            type=[extension for extensions in FORMAT_EXTENSIONS.values() for extension in extensions],
+            help="Upload a CSV, Parquet or Arrow IPC file with delivery order data; "
+                 "columnar files are read with only the required columns"
         )
         
         # Sample data download
@@ -36,14 +59,8 @@ def render_batch_processor(encoder, scaler, model):
         
         # Show required columns
         with st.expander("📋 Required Columns"):
-            required_cols = [
-                "Delivery_person_Age", "Delivery_person_Ratings", "Weatherconditions",
-                "Road_traffic_density", "Vehicle_condition", "Type_of_order",
-                "Type_of_vehicle", "multiple_deliveries", "Festival", "City",
-                "distance_km", "prep_time_min", "order_hour", "order_day", "is_weekend"
-            ]
-            st.write("Your CSV must contain these columns:")
-            for col in required_cols:
+            st.write("Your file must contain these columns:")
+            for col in REQUIRED_COLUMNS:
                 st.write(f"• {col}")
     
     with col2:
@@ -54,29 +71,50 @@ def render_batch_processor(encoder, scaler, model):
         include_insights = st.checkbox("Include AI Insights", value=True)
         
         # Export format
-        export_format = st.selectbox("Export Format", ["CSV", "JSON", "Excel"])
+        export_format = st.selectbox("Export Format", ["CSV", "Parquet", "Arrow IPC"],
+                                     help="Format of the streaming-mode results file")
+        output_format = {"CSV": "csv", "Parquet": "parquet", "Arrow IPC": "arrow"}[export_format]
         
         # Progress tracking
         show_progress = st.checkbox("Show Progress", value=True)
+        
+        # Streaming mode keeps memory flat for very large files
+        streaming_mode = st.checkbox(
+            "Streaming Mode (large files)", value=False,
+            help="Read, score and write the file in fixed-size chunks instead of loading it all at once"
+        )
+        chunk_size = st.number_input(
+            "Rows per Chunk", min_value=1000, max_value=1000000,
+            value=DEFAULT_CHUNK_SIZE, step=1000, disabled=not streaming_mode
+        )
+        
+        # Large files can be sharded across worker processes sharing one model copy;
+        # the pool only pays off with spare cores, so scoring stays in-process by default
+        n_workers = st.number_input(
+            "Worker Processes", min_value=1, max_value=64, value=1, step=1,
+            help="Processes used to score large files; 1 scores in the app process. "
+                 "Measure with benchmarks/run_benchmarks.py --workers before raising it"
+        )
     
     # Process uploaded file
     if uploaded_file is not None:
+        # A new upload replaces the previous streamed results
+        upload_id = getattr(uploaded_file, 'file_id', uploaded_file.name)
+        if st.session_state.get('batch_upload_id') != upload_id:
+            discard_batch_output()
+            st.session_state.batch_upload_id = upload_id
+        
         try:
-            # Preview uploaded data
-            preview_data = pd.read_csv(uploaded_file)
+            # Preview only the first rows; the full file is parsed once when processing
+            file_format = detect_format(uploaded_file.name)
+            preview_data = next(iter_batches(uploaded_file, file_format, chunksize=5), pd.DataFrame())
+            uploaded_file.seek(0)
             st.markdown("#### 👀 Data Preview")
-            st.dataframe(preview_data.head(), use_container_width=True)
+            st.dataframe(preview_data, use_container_width=True)
             
             # Validation
             st.markdown("#### ✅ Validation")
-            required_columns = [
-                "Delivery_person_Age", "Delivery_person_Ratings", "Weatherconditions",
-                "Road_traffic_density", "Vehicle_condition", "Type_of_order",
-                "Type_of_vehicle", "multiple_deliveries", "Festival", "City",
-                "distance_km", "prep_time_min", "order_hour", "order_day", "is_weekend"
-            ]
-            
-            missing_columns = [col for col in required_columns if col not in preview_data.columns]
+            missing_columns = [col for col in REQUIRED_COLUMNS if col not in preview_data.columns]
             
             if missing_columns:
                 st.error(f"❌ Missing required columns: {missing_columns}")
@@ -89,9 +127,21 @@ def render_batch_processor(encoder, scaler, model):
                         # Reset file pointer
                         uploaded_file.seek(0)
                         
+                        if streaming_mode:
+                            with BATCH_LATENCY.time(mode="streaming"):
+                                run_streaming_batch(uploaded_file, encoder, scaler, model,
+                                                    int(chunk_size), show_progress, include_confidence,
+                                                    int(n_workers), file_format, output_format)
+                            return
+                        
                         # Process data
                         try:
-                            batch_results = process_batch_data(uploaded_file, encoder, scaler, model)
+                            with BATCH_LATENCY.time(mode="full"):
+                                batch_results = process_batch_data(
+                                    uploaded_file, encoder, scaler, model,
+                                    include_confidence=include_confidence,
+                                    n_workers=int(n_workers), file_format=file_format
+                                )
                             
                             # Store results in session state
                             st.session_state.batch_results = batch_results
@@ -112,6 +162,67 @@ def render_batch_processor(encoder, scaler, model):
         st.markdown("#### 📊 Previous Batch Results")
         display_batch_results(st.session_state.batch_results, include_confidence, include_insights)
 
+def run_streaming_batch(uploaded_file, encoder, scaler, model, chunk_size, show_progress,
+                        include_confidence=False, n_workers=1, file_format="csv",
+                        output_format="csv"):
+    """Score an upload in streaming mode and offer the results file for download"""
+    progress_bar = st.progress(0) if show_progress else None
+    status = st.empty()
+    
+    def report_progress(chunks_done, rows_done, fraction):
+        if progress_bar is not None and fraction is not None:
+            progress_bar.progress(fraction)
+        status.text(f"Chunk {chunks_done}: {rows_done:,} orders scored")
+    
+    # Results go to disk chunk by chunk instead of being held in memory; only
+    # the latest run's file is kept, in a directory owned by the session
+    discard_batch_output()
+    output_path = os.path.join(get_batch_output_dir(), f"batch_results.{output_format}")
+    
+    try:
+        summary = process_batch_stream(
+            uploaded_file, output_path, encoder, scaler, model,
+            chunksize=chunk_size, progress_callback=report_progress,
+            include_confidence=include_confidence, n_workers=n_workers,
+            file_format=file_format, output_format=output_format
+        )
+    except Exception as e:
+        if os.path.exists(output_path):
+            os.remove(output_path)
+        st.error(f"❌ Error processing batch: {str(e)}")
+        return
+    st.session_state.batch_output_path = output_path
+    
+    if progress_bar is not None:
+        progress_bar.empty()
+    
+    st.success(f"✅ Successfully processed {summary['total_orders']:,} orders in {summary['chunks']} chunks!")
+    
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("Total Orders", f"{summary['total_orders']:,}")
+    with col2:
+        if summary['average_time'] is not None:
+            st.metric("Average Time", f"{summary['average_time']:.1f} min")
+    with col3:
+        if summary['min_time'] is not None:
+            st.metric("Fastest", f"{summary['min_time']:.1f} min")
+    with col4:
+        if summary['max_time'] is not None:
+            st.metric("Slowest", f"{summary['max_time']:.1f} min")
+    
+    if summary['failed_orders']:
+        st.warning(f"⚠️ {summary['failed_orders']:,} orders could not be scored")
+    
+    # Streamlit serves downloads from the app process, so this button holds the
+    # whole results file in memory; scoring and writing above stay chunked
+    with open(output_path, "rb") as f:
+        st.download_button(
+            f"📥 Download Results {output_format.upper()}", f,
+            file_name=f"batch_results.{output_format}", mime=MIME_TYPES[output_format],
+            help=f"{os.path.getsize(output_path) / 1e6:,.1f} MB, loaded into memory to serve the download"
+        )
+
 def display_batch_results(batch_results, include_confidence, include_insights):
     """Display batch processing results"""
     
@@ -138,13 +249,15 @@ def display_batch_results(batch_results, include_confidence, include_insights):
     st.markdown("#### 📋 Detailed Results")
     
     # Add additional columns if requested
-    display_columns = list(batch_results.columns)
+    confidence_columns = ['Confidence_Lower', 'Confidence_Upper']
+    display_columns = [col for col in batch_results.columns if col not in confidence_columns]
     
     if include_confidence:
-        # Add confidence intervals (simplified for demo)
-        batch_results['Confidence_Lower'] = batch_results['Predicted_Delivery_Time'] * 0.85
-        batch_results['Confidence_Upper'] = batch_results['Predicted_Delivery_Time'] * 1.15
-        display_columns.extend(['Confidence_Lower', 'Confidence_Upper'])
+        # Forest intervals come from the scoring pass; estimate them for older results
+        if 'Confidence_Lower' not in batch_results.columns:
+            batch_results['Confidence_Lower'] = batch_results['Predicted_Delivery_Time'] * 0.85
+            batch_results['Confidence_Upper'] = batch_results['Predicted_Delivery_Time'] * 1.15
+        display_columns.extend(confidence_columns)
     
     if include_insights:
         # Add simple insights
@@ -173,7 +286,7 @@ def display_batch_results(batch_results, include_confidence, include_insights):
     
     # Export functionality
     st.markdown("#### 📥 Export Results")
-    col1, col2, col3 = st.columns(3)
+    col1, col2, col3, col4, col5 = st.columns(5)
     
     with col1:
         if st.button("Export as CSV"):
@@ -190,6 +303,16 @@ def display_batch_results(batch_results, include_confidence, include_insights):
             st.markdown(href, unsafe_allow_html=True)
     
     with col3:
+        if st.button("Export as Parquet"):
+            st.download_button("Download Parquet", batch_to_bytes(batch_results, "parquet"),
+                               file_name="batch_results.parquet", mime=MIME_TYPES['parquet'])
+    
+    with col4:
+        if st.button("Export as Arrow"):
+            st.download_button("Download Arrow", batch_to_bytes(batch_results, "arrow"),
+                               file_name="batch_results.arrow", mime=MIME_TYPES['arrow'])
+    
+    with col5:
         if st.button("Export Summary"):
             summary_stats = {
                 'Total_Orders': len(batch_results),
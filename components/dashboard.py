@@ -3,21 +3,44 @@ import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 from utils.visualizations import create_time_series_chart, create_comparison_chart
-from utils.analytics import calculate_delivery_statistics, analyze_prediction_trends
+from utils.history_db import get_history_db
+
+# Newest predictions loaded for per-point charts; totals and averages cover all rows
+ANALYTICS_ROWS = 5000
+
+# Correlation matrix labels and the history columns they read
+CORRELATION_FEATURES = {
+    'Prediction': 'prediction',
+    'Distance': 'distance_km',
+    'Prep_Time': 'prep_time_min',
+    'Age': 'Delivery_person_Age',
+    'Rating': 'Delivery_person_Ratings',
+    'Vehicle_Condition': 'Vehicle_condition',
+    'Multiple_Deliveries': 'multiple_deliveries',
+    'Hour': 'order_hour',
+    'Is_Weekend': 'is_weekend'
+}
+CORRELATION_FEATURES_BY_COLUMN = {name: label for label, name in CORRELATION_FEATURES.items()}
 
 def render_dashboard():
     """Render the analytics dashboard"""
     
     st.markdown("### 📈 Analytics Dashboard")
     
+    db = get_history_db()
+    # Fold in predictions stored since the last render, including other processes'
+    db.refresh()
+    
+    # Key metrics come from running aggregates, whatever the history size
+    stats = db.stats.statistics()
+    
     # Check if we have data
-    if not st.session_state.prediction_history:
+    if not stats:
         st.info("No prediction data available yet. Make some predictions to see analytics!")
         return
     
-    # Calculate statistics
-    stats = calculate_delivery_statistics(st.session_state.prediction_history)
-    trends = analyze_prediction_trends(st.session_state.prediction_history)
+    history = db.recent(ANALYTICS_ROWS)
+    trends = db.stats.trends()
     
     # Key metrics
     st.markdown("#### 📊 Key Metrics")
@@ -53,7 +76,7 @@ def render_dashboard():
     
     # Time series chart
     st.markdown("#### 📈 Prediction Trends")
-    time_series_chart = create_time_series_chart(st.session_state.prediction_history)
+    time_series_chart = create_time_series_chart(db.timeline)
     if time_series_chart:
         st.plotly_chart(time_series_chart, use_container_width=True)
     
@@ -66,11 +89,14 @@ def render_dashboard():
     
     with col2:
         st.markdown("#### 🔍 Pattern Analysis")
-        render_pattern_analysis()
+        render_pattern_analysis(db, history)
     
     # Detailed analytics
     st.markdown("#### 📊 Detailed Analytics")
-    render_detailed_analytics()
+    if stats['total_predictions'] > len(history):
+        st.caption(f"Hourly trends below use the latest {len(history):,} of "
+                   f"{stats['total_predictions']:,} predictions; the other tabs cover all of them.")
+    render_detailed_analytics(db, history)
 
 def render_performance_analysis(stats):
     """Render performance analysis section"""
@@ -108,36 +134,20 @@ def render_performance_analysis(stats):
     else:
         st.error("🚨 Performance needs attention. Average delivery time is high.")
 
-def render_pattern_analysis():
+def render_pattern_analysis(db, history):
     """Render pattern analysis section"""
     
     # Extract patterns from history
-    history_data = st.session_state.prediction_history
-    
-    # Weather pattern analysis
-    weather_data = {}
-    distance_data = []
-    time_data = []
+    distance_data = history.column('distance_km')
+    time_data = history.column('prediction')
     
-    for record in history_data:
-        weather = record['input_data']['Weatherconditions'].iloc[0]
-        distance = record['input_data']['distance_km'].iloc[0]
-        prediction = record['prediction']
-        
-        if weather not in weather_data:
-            weather_data[weather] = []
-        weather_data[weather].append(prediction)
-        
-        distance_data.append(distance)
-        time_data.append(prediction)
+    # Weather pattern analysis, aggregated over every stored prediction
+    weather_df = db.group_average('Weatherconditions').rename(
+        columns={'Weatherconditions': 'Weather', 'avg_time': 'Avg_Time'}
+    )
     
     # Weather impact chart
-    if weather_data:
-        weather_df = pd.DataFrame([
-            {'Weather': weather, 'Avg_Time': sum(times)/len(times)}
-            for weather, times in weather_data.items()
-        ])
-        
+    if not weather_df.empty:
         fig = px.bar(
             weather_df, 
             x='Weather', 
@@ -161,70 +171,81 @@ def render_pattern_analysis():
         fig.update_layout(height=300)
         st.plotly_chart(fig, use_container_width=True)
 
-def render_detailed_analytics():
+def render_detailed_analytics(db, history):
     """Render detailed analytics section"""
     
     # Tabs for different analysis types
     tab1, tab2, tab3 = st.tabs(["📊 Distribution", "🔗 Correlations", "📈 Trends"])
     
     with tab1:
-        render_distribution_analysis()
+        render_distribution_analysis(db.distribution)
     
     with tab2:
-        render_correlation_analysis()
+        render_correlation_analysis(db.correlations)
     
     with tab3:
-        render_trend_analysis()
+        render_trend_analysis(history, db.timeline)
 
-def render_distribution_analysis():
-    """Render distribution analysis"""
+def render_distribution_analysis(distribution):
+    """Render distribution analysis from the streaming histogram and quantile sketch"""
     
-    history_data = st.session_state.prediction_history
-    predictions = [record['prediction'] for record in history_data]
+    if not len(distribution):
+        st.info("No prediction data available yet.")
+        return
     
-    # Distribution histogram
-    fig = px.histogram(
-        x=predictions,
-        nbins=20,
+    # Approximate percentiles over the whole history
+    percentiles = [5, 25, 50, 75, 95]
+    values = distribution.quantiles([p / 100 for p in percentiles])
+    for col, p, value in zip(st.columns(len(percentiles)), percentiles, values):
+        col.metric(f"P{p}", f"{value:.1f} min")
+    
+    # Distribution histogram from the fixed bins
+    histogram = distribution.histogram
+    left_edges, counts = histogram.nonempty()
+    fig = go.Figure(go.Bar(
+        x=left_edges + histogram.bin_width / 2,
+        y=counts,
+        width=histogram.bin_width,
+        marker_color='#636EFA'
+    ))
+    fig.update_layout(
         title='Distribution of Predicted Delivery Times',
-        labels={'x': 'Delivery Time (minutes)', 'y': 'Frequency'}
+        xaxis_title='Delivery Time (minutes)',
+        yaxis_title='Frequency',
+        bargap=0.05
     )
     st.plotly_chart(fig, use_container_width=True)
-    
-    # Box plot for outlier detection
-    fig = px.box(
-        y=predictions,
+    if histogram.underflow or histogram.overflow:
+        st.caption(f"{histogram.underflow} prediction(s) below {histogram.low:.0f} min and "
+                   f"{histogram.overflow} above {histogram.high:.0f} min are not shown.")
+    
+    # Box plot from sketch quartiles; individual outliers are not kept
+    box = distribution.box_stats()
+    fig = go.Figure(go.Box(
+        q1=[box['q1']], median=[box['median']], q3=[box['q3']],
+        lowerfence=[box['lower_fence']], upperfence=[box['upper_fence']],
+        name='Predictions'
+    ))
+    fig.update_layout(
         title='Delivery Time Distribution (Box Plot)',
-        labels={'y': 'Delivery Time (minutes)'}
+        yaxis_title='Delivery Time (minutes)'
     )
     st.plotly_chart(fig, use_container_width=True)
 
-def render_correlation_analysis():
-    """Render correlation analysis"""
-    
-    history_data = st.session_state.prediction_history
-    
-    # Extract features for correlation analysis
-    features_data = []
-    for record in history_data:
-        features = {
-            'Prediction': record['prediction'],
-            'Distance': record['input_data']['distance_km'].iloc[0],
-            'Prep_Time': record['input_data']['prep_time_min'].iloc[0],
-            'Age': record['input_data']['Delivery_person_Age'].iloc[0],
-            'Rating': record['input_data']['Delivery_person_Ratings'].iloc[0],
-            'Vehicle_Condition': record['input_data']['Vehicle_condition'].iloc[0],
-            'Multiple_Deliveries': record['input_data']['multiple_deliveries'].iloc[0],
-            'Hour': record['input_data']['order_hour'].iloc[0],
-            'Is_Weekend': record['input_data']['is_weekend'].iloc[0]
-        }
-        features_data.append(features)
+def render_correlation_analysis(correlations):
+    """Render correlation analysis from the online co-moment matrices"""
     
-    if len(features_data) > 5:  # Need sufficient data for correlation
-        features_df = pd.DataFrame(features_data)
-        
-        # Correlation matrix
-        corr_matrix = features_df.corr()
+    weighting = st.radio(
+        "Weighting", ["All history", "Recent predictions"], horizontal=True, key="correlation_weighting",
+        help=f"Recent weighting halves an observation's influence every "
+             f"{correlations['recent'].half_life:.0f} predictions"
+    )
+    covariance = correlations['recent' if weighting == "Recent predictions" else 'all']
+    
+    if covariance.count > 5:  # Need sufficient data for correlation
+        # Correlation matrix, labelled for display
+        columns = [CORRELATION_FEATURES_BY_COLUMN[name] for name in covariance.names]
+        corr_matrix = pd.DataFrame(covariance.correlation(), index=columns, columns=columns)
         
         fig = px.imshow(
             corr_matrix,
@@ -236,7 +257,7 @@ def render_correlation_analysis():
         st.plotly_chart(fig, use_container_width=True)
         
         # Top correlations with prediction
-        pred_corr = corr_matrix['Prediction'].abs().sort_values(ascending=False)[1:]  # Exclude self-correlation
+        pred_corr = corr_matrix['Prediction'].drop('Prediction').abs().dropna().sort_values(ascending=False)
         
         st.markdown("#### 🔍 Top Factors Affecting Delivery Time")
         for feature, correlation in pred_corr.head(5).items():
@@ -244,18 +265,16 @@ def render_correlation_analysis():
     else:
         st.info("Need more prediction data for correlation analysis.")
 
-def render_trend_analysis():
+def render_trend_analysis(history, timeline):
     """Render trend analysis"""
     
-    history_data = st.session_state.prediction_history
-    
-    if len(history_data) < 5:
+    if len(timeline) < 5:
         st.info("Need more prediction history for trend analysis.")
         return
     
     # Time-based trends
-    timestamps = [record['timestamp'] for record in history_data]
-    predictions = [record['prediction'] for record in history_data]
+    timestamps = history.column('timestamp')
+    predictions = history.column('prediction')
     
     # Create time-based DataFrame
     trend_df = pd.DataFrame({
@@ -266,7 +285,7 @@ def render_trend_analysis():
     # Resample by hour if we have enough data
     if len(trend_df) > 10:
         trend_df.set_index('Timestamp', inplace=True)
-        hourly_trend = trend_df.resample('H').mean()
+        hourly_trend = trend_df.resample(pd.Timedelta(hours=1)).mean()
         
         fig = px.line(
             hourly_trend,
@@ -275,18 +294,21 @@ def render_trend_analysis():
         )
         st.plotly_chart(fig, use_container_width=True)
     
-    # Moving average
-    if len(predictions) >= 5:
-        moving_avg = pd.Series(predictions).rolling(window=5).mean()
+    # Moving average over the whole history, both series downsampled to the point budget
+    if len(timeline) >= 5:
+        index, _, values = timeline.series('prediction')
+        average_index, _, moving_avg = timeline.series('moving_average')
         
         fig = go.Figure()
         fig.add_trace(go.Scatter(
-            y=predictions,
+            x=index,
+            y=values,
             mode='lines+markers',
             name='Predictions',
             line=dict(color='lightblue')
         ))
         fig.add_trace(go.Scatter(
+            x=average_index,
             y=moving_avg,
             mode='lines',
             name='Moving Average (5)',
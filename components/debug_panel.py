@@ -0,0 +1,81 @@
+import os
+import streamlit as st
+import pandas as pd
+import plotly.graph_objects as go
+from utils.profiling import (
+    PROFILE_DIR, COMPONENT_FILES, is_admin, arm_capture, pending_runs, captures, summarize
+)
+
+def render_trace_panel(tracer):
+    """Render per-stage timings of a traced request with a Chrome trace export"""
+
+    with st.expander(f"⏱️ Stage Timings ({tracer.total_seconds() * 1000:.1f} ms)", expanded=True):
+        summary = pd.DataFrame(tracer.summary())
+        if summary.empty:
+            st.info("No stages were recorded on this run.")
+            return
+
+        st.dataframe(
+            summary.style.format({'Start (ms)': "{:.2f}", 'Duration (ms)': "{:.2f}", 'Share (%)': "{:.1f}"}),
+            use_container_width=True
+        )
+
+        # Timeline of the spans, one bar per stage
+        fig = go.Figure(go.Bar(
+            y=summary['Stage'],
+            x=summary['Duration (ms)'],
+            base=summary['Start (ms)'],
+            orientation='h',
+            marker_color='#45B7D1',
+            text=[f"{d:.2f} ms" for d in summary['Duration (ms)']],
+            textposition='auto'
+        ))
+        fig.update_layout(
+            title="Request Timeline",
+            xaxis_title="Time since request start (ms)",
+            yaxis=dict(autorange="reversed"),
+            template="plotly_white",
+            height=max(250, 32 * len(summary))
+        )
+        st.plotly_chart(fig, use_container_width=True)
+
+        st.download_button(
+            "📥 Export Chrome Trace", tracer.to_chrome_trace(),
+            file_name=f"{tracer.name}_trace.json", mime="application/json",
+            help="Open in chrome://tracing or ui.perfetto.dev"
+        )
+
+def render_profiler_panel():
+    """Render the admin-only profiler controls in the sidebar"""
+
+    with st.sidebar.expander("🔬 Profiler", expanded=False):
+        token = st.text_input("Admin Token", type="password", key="profiler_admin_token")
+        if not is_admin(token):
+            if token:
+                st.error("Invalid admin token")
+            return
+
+        n_runs = st.number_input("Reruns to Capture", min_value=1, max_value=50, value=3, step=1)
+        if st.button("⏺️ Profile Next Reruns"):
+            arm_capture(st.session_state, n_runs)
+        remaining = pending_runs(st.session_state)
+        if remaining:
+            st.info(f"Profiling the next {remaining} rerun(s)")
+
+        paths = [path for path in captures(st.session_state) if os.path.exists(path)]
+        if not paths:
+            return
+
+        st.markdown(f"**{len(paths)} capture(s)** in `{PROFILE_DIR}`")
+        for path in paths:
+            with open(path, "rb") as f:
+                st.download_button(f"📥 {os.path.basename(path)}", f.read(),
+                                   file_name=os.path.basename(path), key=f"profile_{path}")
+
+        summary = summarize(paths)
+        st.markdown("**Top cumulative functions**")
+        st.dataframe(pd.DataFrame(summary['overall']), use_container_width=True)
+        for component in COMPONENT_FILES:
+            if summary[component]:
+                st.markdown(f"**{component}**")
+                st.dataframe(pd.DataFrame(summary[component]), use_container_width=True)
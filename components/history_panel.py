@@ -0,0 +1,86 @@
+import math
+import os
+import streamlit as st
+import pandas as pd
+from utils.history_db import get_history_db, FILTER_COLUMNS
+from components.batch_processor import get_batch_output_dir
+
+PAGE_SIZES = [25, 50, 100, 250]
+
+# Filter labels shown above the table
+FILTER_LABELS = {
+    'City': "City",
+    'Weatherconditions': "Weather",
+    'Road_traffic_density': "Traffic"
+}
+
+def format_history_page(page):
+    """Format one page of stored predictions for display"""
+    lower = page['lower'].round(1).astype(str)
+    upper = page['upper'].round(1).astype(str)
+    return pd.DataFrame({
+        'Timestamp': pd.to_datetime(page['timestamp']).dt.strftime('%Y-%m-%d %H:%M:%S'),
+        'Predicted Time (min)': page['prediction'].round(1),
+        'Confidence Range': lower + ' - ' + upper,
+        'Distance (km)': page['distance_km'],
+        'City': page['City'],
+        'Weather': page['Weatherconditions'],
+        'Traffic': page['Road_traffic_density']
+    })
+
+def render_history():
+    """Render the stored prediction history one page at a time"""
+
+    st.markdown("### 📋 Prediction History")
+    db = get_history_db()
+
+    if not db.count():
+        st.info("No predictions made yet. Use the Single Prediction tab to start!")
+        return
+
+    # Filters run against indexed columns
+    filters = {}
+    filter_cols = st.columns(len(FILTER_COLUMNS) + 1)
+    for col, column in zip(filter_cols, FILTER_COLUMNS):
+        with col:
+            choice = st.selectbox(FILTER_LABELS[column], ["All"] + db.distinct(column), key=f"history_{column}")
+            filters[column] = None if choice == "All" else choice
+    with filter_cols[-1]:
+        page_size = st.selectbox("Rows per Page", PAGE_SIZES, index=1, key="history_page_size")
+
+    total = db.count(filters)
+    pages = max(1, math.ceil(total / page_size))
+    page_number = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, value=1, step=1,
+                                  key="history_page")
+
+    page = db.page((page_number - 1) * page_size, page_size, filters)
+    st.caption(f"{total:,} predictions match; newest first")
+    st.dataframe(format_history_page(page), use_container_width=True)
+
+    # Export the matching rows: streamed from the database in chunks into a file in
+    # the session's temp directory, which stays downloadable across reruns
+    export = st.session_state.get('history_export')
+    if st.button("📥 Export History"):
+        path = os.path.join(get_batch_output_dir(), "prediction_history.csv")
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            for chunk in db.iter_csv(filters):
+                f.write(chunk)
+        export = st.session_state.history_export = {'path': path, 'filters': filters, 'rows': total}
+        st.success("✅ History exported successfully!")
+
+    # Offered until the filters change; serving the download holds the file in memory
+    if export is not None and export['filters'] == filters and os.path.exists(export['path']):
+        with open(export['path'], "rb") as f:
+            st.download_button(
+                f"Download CSV ({export['rows']:,} predictions)", f,
+                file_name="prediction_history.csv", mime="text/csv"
+            )
+
+    # Clear history
+    confirm = st.checkbox("Also delete stored history for every session", key="history_confirm_clear")
+    if st.button("🗑️ Clear History", disabled=not confirm):
+        db.clear()
+        if export is not None and os.path.exists(export['path']):
+            os.remove(export['path'])
+        st.session_state.history_export = None
+        st.rerun()
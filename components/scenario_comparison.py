@@ -1,10 +1,11 @@
+import hashlib
 import streamlit as st
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
-from utils.data_handler import prepare_input_data, make_prediction
-from utils.analytics import calculate_confidence_interval, generate_prediction_insights
+from utils.data_handler import predict_frame, get_model_version
+from utils.analytics import generate_prediction_insights
 
 def render_scenario_comparison(encoder, scaler, model):
     """Render scenario comparison tool"""
@@ -15,6 +16,8 @@ def render_scenario_comparison(encoder, scaler, model):
     # Initialize session state for scenarios
     if 'scenarios' not in st.session_state:
         st.session_state.scenarios = []
+    if 'scenario_results' not in st.session_state:
+        st.session_state.scenario_results = {}
     
     # Quick preset scenarios
     st.markdown("#### ⚡ Quick Scenario Presets")
@@ -76,61 +79,97 @@ def render_scenario_comparison(encoder, scaler, model):
                     multi_deliveries, festival, day, is_weekend
                 )
                 
-                # Make prediction
-                final_input = prepare_input_data(scenario_data['data'], encoder, scaler)
-                prediction = make_prediction(model, final_input)
-                confidence = calculate_confidence_interval(model, final_input)
-                
-                scenario_data['prediction'] = prediction
-                scenario_data['confidence'] = confidence
-                
+                # Scored with any other pending scenarios on the rerun
                 st.session_state.scenarios.append(scenario_data)
                 st.success(f"✅ Added scenario: {scenario_name}")
                 st.rerun()
     
     # Display scenarios
     if st.session_state.scenarios:
-        # Ensure all scenarios have predictions
-        for scenario in st.session_state.scenarios:
-            if scenario['prediction'] is None:
-                try:
-                    final_input = prepare_input_data(scenario['data'], encoder, scaler)
-                    prediction = make_prediction(model, final_input)
-                    confidence = calculate_confidence_interval(model, final_input)
-                    scenario['prediction'] = prediction
-                    scenario['confidence'] = confidence
-                except Exception as e:
-                    st.error(f"Error predicting scenario {scenario['name']}: {str(e)}")
-        
-        st.markdown("#### 📊 Scenario Comparison Results")
-        
-        # Scenario cards
-        display_scenario_cards(st.session_state.scenarios)
+        # Score new or changed scenarios together; unchanged ones reuse their results
+        failed = score_scenarios(st.session_state.scenarios, st.session_state.scenario_results,
+                                 encoder, scaler, model)
+        for name, error in failed:
+            st.error(f"Error predicting scenario {name}: {error}")
+        scenarios = [s for s in st.session_state.scenarios if s['prediction'] is not None]
         
-        # Comparison chart
-        st.markdown("#### 📈 Visual Comparison")
-        comparison_chart = create_scenario_comparison_chart(st.session_state.scenarios)
-        st.plotly_chart(comparison_chart, use_container_width=True)
-        
-        # Detailed analysis
-        st.markdown("#### 🔍 Detailed Analysis")
-        analysis_chart = create_detailed_analysis_chart(st.session_state.scenarios)
-        st.plotly_chart(analysis_chart, use_container_width=True)
-        
-        # Recommendations
-        st.markdown("#### 💡 Recommendations")
-        display_recommendations(st.session_state.scenarios)
+        if scenarios:
+            st.markdown("#### 📊 Scenario Comparison Results")
+            
+            # Scenario cards
+            display_scenario_cards(scenarios)
+            
+            # Comparison chart
+            st.markdown("#### 📈 Visual Comparison")
+            comparison_chart = create_scenario_comparison_chart(scenarios)
+            st.plotly_chart(comparison_chart, use_container_width=True)
+            
+            # Detailed analysis
+            st.markdown("#### 🔍 Detailed Analysis")
+            analysis_chart = create_detailed_analysis_chart(scenarios)
+            st.plotly_chart(analysis_chart, use_container_width=True)
+            
+            # Recommendations
+            st.markdown("#### 💡 Recommendations")
+            display_recommendations(scenarios)
         
         # Clear scenarios
         col1, col2 = st.columns([1, 4])
         with col1:
             if st.button("🗑️ Clear All", type="secondary"):
                 st.session_state.scenarios = []
+                st.session_state.scenario_results = {}
                 st.rerun()
     
     else:
         st.info("No scenarios created yet. Add some scenarios to start comparing!")
 
+def scenario_hash(data, model_version):
+    """Content hash of a scenario's inputs under a given model version"""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(str(model_version).encode())
+    digest.update(repr(tuple(data.iloc[0].tolist())).encode())
+    return digest.hexdigest()
+
+def score_scenarios(scenarios, results, encoder, scaler, model):
+    """Fill in predictions for scenarios, scoring only new or changed ones
+
+    ``results`` maps content hashes to ``(prediction, confidence)`` (or an
+    error message) and is kept across reruns; every scenario missing from it
+    is scored in one batched call with intervals. Returns ``(name, error)``
+    for scenarios that could not be scored.
+    """
+    model_version = get_model_version(model)
+    keys = [scenario_hash(scenario['data'], model_version) for scenario in scenarios]
+    
+    pending = {}
+    for key, scenario in zip(keys, scenarios):
+        if key not in results and key not in pending:
+            pending[key] = scenario['data']
+    
+    if pending:
+        batch = pd.concat(list(pending.values()), ignore_index=True)
+        scored = predict_frame(batch, encoder, scaler, model, include_confidence=True)
+        for key, prediction, lower, upper in zip(pending, scored['Predicted_Delivery_Time'],
+                                                 scored['Confidence_Lower'], scored['Confidence_Upper']):
+            if isinstance(prediction, str):
+                results[key] = prediction
+            else:
+                results[key] = (float(prediction), (float(lower), float(upper)))
+    
+    failed = []
+    for key, scenario in zip(keys, scenarios):
+        if isinstance(results[key], str):
+            scenario['prediction'] = scenario['confidence'] = None
+            failed.append((scenario['name'], results[key]))
+        else:
+            scenario['prediction'], scenario['confidence'] = results[key]
+    
+    # Forget results of scenarios that were removed
+    for key in set(results) - set(keys):
+        del results[key]
+    return failed
+
 def create_scenario_data(name, age, rating, weather, traffic, vehicle_condition, 
                         order_type, vehicle_type, distance, prep_time, hour, 
                         city, multi_deliveries, festival, day, is_weekend):
@@ -163,10 +202,6 @@ def create_scenario_data(name, age, rating, weather, traffic, vehicle_condition,
 
 def add_preset_scenario(preset_type):
     """Add preset scenario to comparison"""
-    # Import at function level to avoid circular imports
-    from utils.data_handler import prepare_input_data, make_prediction
-    from utils.analytics import calculate_confidence_interval
-    
     presets = {
         "rush_hour": {
             "name": "Rush Hour",
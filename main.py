@@ -1,23 +1,31 @@
 import streamlit as st
-import pandas as pd
 import numpy as np
 import joblib
 import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
-import time
 import json
+import os
 from datetime import datetime, timedelta
-import base64
 from io import StringIO
 
 # Import custom components
 from components.prediction_form import render_prediction_form
 from components.scenario_comparison import render_scenario_comparison
 from components.dashboard import render_dashboard
-from utils.data_handler import load_models, prepare_input_data, make_prediction
+from components.history_panel import render_history
+from components.debug_panel import render_trace_panel, render_profiler_panel
+from utils.data_handler import (
+    load_models, predict_with_cache, count_trees,
+    tree_budget, FAST_MODE_TREES
+)
 from utils.visualizations import create_prediction_charts, create_factor_analysis
-from utils.analytics import generate_prediction_insights, calculate_confidence_interval
+from utils.analytics import generate_prediction_insights
+from utils.sensitivity import sensitivity_curves
+from utils.tracing import trace_request, span
+from utils.metrics import start_metrics_server
+from utils.profiling import begin_rerun, end_rerun
+from utils.history_db import get_history_db
 from utils.theme_manager import initialize_theme, render_theme_toggle, get_dynamic_css
 
 # Page configuration
@@ -28,6 +36,9 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# Profile this rerun when an admin armed a capture (see the sidebar profiler)
+begin_rerun(st.session_state)
+
 # Initialize theme
 initialize_theme()
 
@@ -44,8 +55,6 @@ def load_css():
 load_css()
 
 # Initialize session state
-if 'prediction_history' not in st.session_state:
-    st.session_state.prediction_history = []
 if 'current_prediction' not in st.session_state:
     st.session_state.current_prediction = None
 if 'scenarios' not in st.session_state:
@@ -56,6 +65,15 @@ if 'scenarios' not in st.session_state:
 def load_ml_models():
     return load_models()
 
+# Expose Prometheus metrics when METRICS_PORT is set; with several workers
+# sharing METRICS_DIR the first to bind the port serves the totals
+@st.cache_resource
+def start_metrics_endpoint():
+    port = os.environ.get("METRICS_PORT")
+    return start_metrics_server(int(port)) if port else None
+
+start_metrics_endpoint()
+
 try:
     encoder, scaler, model = load_ml_models()
 except Exception as e:
@@ -66,6 +84,12 @@ except Exception as e:
 # Theme toggle
 #render_theme_toggle()
 
+# Debug options
+with st.sidebar.expander("🛠️ Debug", expanded=False):
+    show_timings = st.checkbox("Show stage timings", value=False,
+                               help="Trace each stage of a prediction and show where time goes")
+render_profiler_panel()
+
 # Header with animation
 st.markdown("""
 <div class="header-container">
@@ -93,65 +117,86 @@ with tabs[0]:
     with col2:
         #st.markdown('<div class="results-container">', unsafe_allow_html=True)
         
-        if st.button("🔍 Predict Delivery Time", key="single_predict", help="Click to generate prediction"):
-            with st.spinner("🤖 AI is analyzing your delivery parameters..."):
-                # Add loading animation
-                progress_bar = st.progress(0)
-                for i in range(100):
-                    time.sleep(0.01)
-                    progress_bar.progress(i + 1)
-                
-                # Make prediction
-                final_input = prepare_input_data(prediction_data, encoder, scaler)
-                prediction = make_prediction(model, final_input)
-                confidence = calculate_confidence_interval(model, final_input)
-                
-                # Store prediction
-                prediction_record = {
-                    'timestamp': datetime.now(),
-                    'prediction': prediction,
-                    'confidence': confidence,
-                    'input_data': prediction_data.copy()
-                }
-                st.session_state.prediction_history.append(prediction_record)
-                st.session_state.current_prediction = prediction_record
+        # Stage timings are recorded only while the debug option is on
+        with trace_request("single_prediction", enabled=show_timings) as tracer:
+            # Fast mode previews with the first trees; the full ensemble stays the default
+            full_trees = count_trees(model)
+            inference_tier = st.radio(
+                "Inference Tier", ["Full ensemble", "Fast preview"], horizontal=True,
+                help="Fast preview evaluates only the first trees of the forest for lower latency"
+            )
+            n_trees = None
+            if inference_tier == "Fast preview" and full_trees and full_trees > 1:
+                fast_trees = st.slider("Trees in Fast Preview", min_value=1, max_value=full_trees,
+                                       value=min(FAST_MODE_TREES, full_trees))
+                n_trees = tree_budget(model, "fast", fast_trees)
+        
+            if st.button("🔍 Predict Delivery Time", key="single_predict", help="Click to generate prediction"):
+                with st.spinner("🤖 AI is analyzing your delivery parameters..."):
+                    # Prediction and confidence interval, reused for repeated inputs
+                    prediction, confidence = predict_with_cache(prediction_data, encoder, scaler, model,
+                                                                n_trees=n_trees)
                 
-                # Clear progress bar
-                progress_bar.empty()
+                    # Store prediction
+                    prediction_record = {
+                        'timestamp': datetime.now(),
+                        'prediction': prediction,
+                        'confidence': confidence,
+                        'input_data': prediction_data.copy(),
+                        'n_trees': n_trees
+                    }
+                    get_history_db().add(
+                        prediction_record['timestamp'], prediction, confidence, prediction_data, n_trees
+                    )
+                    st.session_state.current_prediction = prediction_record
                 
-                # Display results with animation
-                st.markdown(f"""
-                <div class="prediction-result">
-                    <div class="prediction-card">
-                        <h3>⏱️ Estimated Delivery Time</h3>
-                        <div class="prediction-value">{prediction:.1f} minutes</div>
-                        <div class="confidence-range">
-                            Confidence: {confidence[0]:.1f} - {confidence[1]:.1f} minutes
+                    # Display results with animation
+                    with span("render_result"):
+                        st.markdown(f"""
+                        <div class="prediction-result">
+                            <div class="prediction-card">
+                                <h3>⏱️ Estimated Delivery Time</h3>
+                                <div class="prediction-value">{prediction:.1f} minutes</div>
+                                <div class="confidence-range">
+                                    Confidence: {confidence[0]:.1f} - {confidence[1]:.1f} minutes
+                                </div>
+                            </div>
                         </div>
-                    </div>
-                </div>
-                """, unsafe_allow_html=True)
+                        """, unsafe_allow_html=True)
                 
-                # Success animation
-                st.balloons()
+                    # Success animation
+                    with span("st.balloons"):
+                        st.balloons()
                 
-                # Insights
-                insights = generate_prediction_insights(prediction_data, prediction)
-                st.markdown('<div class="insights-container">', unsafe_allow_html=True)
-                st.markdown("### 🧠 AI Insights")
-                for insight in insights:
-                    st.info(f"💡 {insight}")
-                st.markdown('</div>', unsafe_allow_html=True)
+                    # Insights
+                    insights = generate_prediction_insights(prediction_data, prediction)
+                    st.markdown('<div class="insights-container">', unsafe_allow_html=True)
+                    st.markdown("### 🧠 AI Insights")
+                    for insight in insights:
+                        st.info(f"💡 {insight}")
+                    st.markdown('</div>', unsafe_allow_html=True)
         
-        # Display current prediction charts
-        if st.session_state.current_prediction:
-            st.markdown("### 📊 Prediction Analysis")
-            charts = create_prediction_charts(st.session_state.current_prediction)
-            st.plotly_chart(charts['factor_impact'], use_container_width=True)
+            # Display current prediction charts
+            if st.session_state.current_prediction:
+                st.markdown("### 📊 Prediction Analysis")
+                # Every one-factor variant of the order is scored in one forest pass, once
+                # per prediction; reruns reuse the curves stored with the record
+                current = st.session_state.current_prediction
+                if 'sensitivity' not in current:
+                    current['sensitivity'] = sensitivity_curves(current['input_data'], encoder, scaler, model,
+                                                                n_trees=current.get('n_trees'))
+                charts = create_prediction_charts(current, current['sensitivity'])
+                with span("render_charts"):
+                    st.plotly_chart(charts['factor_impact'], use_container_width=True)
+                    st.plotly_chart(charts['sensitivity'], use_container_width=True)
             
-            # Factor analysis
-            factor_chart = create_factor_analysis(prediction_data)
-            st.plotly_chart(factor_chart, use_container_width=True)
+                # Factor analysis
+                factor_chart = create_factor_analysis(prediction_data)
+                with span("render_factor_chart"):
+                    st.plotly_chart(factor_chart, use_container_width=True)
+        
+        if tracer is not None:
+            render_trace_panel(tracer)
         
         st.markdown('</div>', unsafe_allow_html=True)
     
@@ -172,39 +217,7 @@ with tabs[2]:
 # Tab 4: History
 with tabs[3]:
     st.markdown('<div class="tab-content">', unsafe_allow_html=True)
-    st.markdown("### 📋 Prediction History")
-    
-    if st.session_state.prediction_history:
-        # Display history in a nice format
-        history_df = pd.DataFrame([
-            {
-                'Timestamp': record['timestamp'].strftime('%Y-%m-%d %H:%M:%S'),
-                'Predicted Time (min)': f"{record['prediction']:.1f}",
-                'Confidence Range': f"{record['confidence'][0]:.1f} - {record['confidence'][1]:.1f}",
-                'Distance (km)': record['input_data']['distance_km'].iloc[0],
-                'Weather': record['input_data']['Weatherconditions'].iloc[0],
-                'Traffic': record['input_data']['Road_traffic_density'].iloc[0]
-            }
-            for record in st.session_state.prediction_history
-        ])
-        
-        st.dataframe(history_df, use_container_width=True)
-        
-        # Export functionality
-        if st.button("📥 Export History"):
-            csv = history_df.to_csv(index=False)
-            b64 = base64.b64encode(csv.encode()).decode()
-            href = f'<a href="data:file/csv;base64,{b64}" download="prediction_history.csv">Download CSV</a>'
-            st.markdown(href, unsafe_allow_html=True)
-            st.success("✅ History exported successfully!")
-        
-        # Clear history
-        if st.button("🗑️ Clear History"):
-            st.session_state.prediction_history = []
-            st.rerun()
-    else:
-        st.info("No predictions made yet. Use the Single Prediction tab to start!")
-    
+    render_history()
     st.markdown('</div>', unsafe_allow_html=True)
 
 # Footer
@@ -213,3 +226,6 @@ st.markdown("""
     <p>Built with ❤️ using Streamlit | AI-Powered Delivery Time Prediction</p>
 </div>
 """, unsafe_allow_html=True)
+
+# Finish this rerun's profile, if one is being captured
+end_rerun(st.session_state)
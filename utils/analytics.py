@@ -1,30 +1,78 @@
 import numpy as np
 import pandas as pd
 from datetime import datetime, timedelta
+from joblib import Parallel, delayed, effective_n_jobs
+from utils.tracing import traced
+
+def predict_per_tree(model, final_input, n_jobs=None, n_trees=None):
+    """Return every estimator's predictions as an (n_trees, n_rows) array
+
+    Trees are split into contiguous blocks evaluated on a thread pool; sklearn's
+    tree traversal releases the GIL, so blocks run in parallel. Compiled
+    forests evaluate all trees in one vectorized traversal instead.
+    ``n_trees`` limits evaluation to the first n estimators.
+    """
+    if hasattr(model, 'predict_per_tree'):
+        return model.predict_per_tree(final_input, n_trees)
+    
+    estimators = model.estimators_[:n_trees]
+    X = np.ascontiguousarray(final_input, dtype=np.float32)
+    tree_predictions = np.empty((len(estimators), X.shape[0]), dtype=np.float64)
+    
+    def predict_block(start, stop):
+        for i in range(start, stop):
+            # Input is already float32 and contiguous, so skip per-tree validation
+            tree_predictions[i] = estimators[i].predict(X, check_input=False)
+    
+    if n_jobs is None:
+        n_jobs = getattr(model, 'n_jobs', None)
+    n_jobs = max(1, min(effective_n_jobs(n_jobs), len(estimators)))
+    
+    if n_jobs == 1:
+        predict_block(0, len(estimators))
+    else:
+        bounds = np.linspace(0, len(estimators), n_jobs + 1).astype(int)
+        Parallel(n_jobs=n_jobs, prefer="threads")(
+            delayed(predict_block)(start, stop) for start, stop in zip(bounds[:-1], bounds[1:])
+        )
+    
+    return tree_predictions
 
-def calculate_confidence_interval(model, final_input, confidence=0.95):
-    """Calculate confidence interval for predictions"""
-    # For ensemble models like Random Forest, we can use prediction variance
-    if hasattr(model, 'estimators_'):
-        # Get predictions from all trees
-        predictions = np.array([tree.predict(final_input) for tree in model.estimators_])
-        mean_pred = np.mean(predictions)
-        std_pred = np.std(predictions)
+@traced()
+def predict_with_uncertainty(model, final_input, confidence=0.95, n_jobs=None, n_trees=None):
+    """Predict mean, spread and confidence bounds for every row in one forest pass
+    
+    Returns a dict of arrays ('mean', 'std', 'lower', 'upper'), one entry per row.
+    ``n_trees`` evaluates only the first n estimators of a forest (fast mode).
+    """
+    if hasattr(model, 'estimators_') or hasattr(model, 'predict_per_tree'):
+        # Collect per-tree predictions once; the mean and spread both come from them
+        tree_predictions = predict_per_tree(model, final_input, n_jobs, n_trees)
+        mean_pred = tree_predictions.mean(axis=0)
+        std_pred = tree_predictions.std(axis=0)
         
-        # Calculate confidence interval
         z_score = 1.96 if confidence == 0.95 else 2.576  # 95% or 99%
         margin = z_score * std_pred
-        
-        lower_bound = mean_pred - margin
-        upper_bound = mean_pred + margin
-        
-        return (max(0, float(lower_bound)), float(upper_bound))
     else:
         # For other models, use a simple heuristic
-        prediction = model.predict(final_input)[0]
-        margin = prediction * 0.15  # 15% margin
-        return (max(0, prediction - margin), prediction + margin)
+        mean_pred = np.asarray(model.predict(final_input), dtype=np.float64)
+        std_pred = np.full_like(mean_pred, np.nan)
+        margin = mean_pred * 0.15  # 15% margin
+    
+    return {
+        'mean': mean_pred,
+        'std': std_pred,
+        'lower': np.maximum(0, mean_pred - margin),
+        'upper': mean_pred + margin
+    }
+
+@traced()
+def calculate_confidence_interval(model, final_input, confidence=0.95, n_trees=None):
+    """Calculate confidence interval for predictions"""
+    result = predict_with_uncertainty(model, final_input, confidence, n_trees=n_trees)
+    return (float(result['lower'][0]), float(result['upper'][0]))
 
+@traced()
 def generate_prediction_insights(input_data, prediction):
     """Generate insights about the prediction"""
     insights = []
@@ -82,55 +130,6 @@ def generate_prediction_insights(input_data, prediction):
     
     return insights
 
-def calculate_delivery_statistics(history_data):
-    """Calculate statistics from prediction history"""
-    if not history_data:
-        return {}
-    
-    predictions = [record['prediction'] for record in history_data]
-    
-    stats = {
-        'total_predictions': len(predictions),
-        'average_time': np.mean(predictions),
-        'median_time': np.median(predictions),
-        'std_deviation': np.std(predictions),
-        'min_time': np.min(predictions),
-        'max_time': np.max(predictions)
-    }
-    
-    return stats
-
-def analyze_prediction_trends(history_data):
-    """Analyze trends in prediction history"""
-    if len(history_data) < 2:
-        return {}
-    
-    # Sort by timestamp
-    sorted_data = sorted(history_data, key=lambda x: x['timestamp'])
-    
-    # Calculate trends
-    predictions = [record['prediction'] for record in sorted_data]
-    timestamps = [record['timestamp'] for record in sorted_data]
-    
-    # Simple trend analysis
-    if len(predictions) >= 5:
-        recent_avg = np.mean(predictions[-5:])
-        earlier_avg = np.mean(predictions[:-5])
-        trend = "increasing" if recent_avg > earlier_avg else "decreasing"
-    else:
-        trend = "stable"
-    
-    # Time between predictions
-    time_diffs = [(timestamps[i] - timestamps[i-1]).total_seconds() / 60 
-                  for i in range(1, len(timestamps))]
-    avg_interval = np.mean(time_diffs) if time_diffs else 0
-    
-    return {
-        'trend': trend,
-        'average_interval_minutes': avg_interval,
-        'prediction_frequency': len(predictions)
-    }
-
 def generate_recommendations(input_data, prediction):
     """Generate recommendations to optimize delivery time"""
     recommendations = []
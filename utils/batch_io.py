@@ -0,0 +1,290 @@
+"""Reading and writing batch files in CSV, Parquet and Arrow IPC formats
+
+Parquet and Arrow IPC reads are projected to the required columns, so typed
+numeric and dictionary-encoded columns reach the feature pipeline without any
+text parsing. Columnar formats need the optional ``pyarrow`` package.
+"""
+import io
+import os
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as ipc
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - optional dependency
+    pa = ipc = pq = None
+
+BATCH_FORMATS = ["csv", "parquet", "arrow"]
+
+# Upload extensions accepted for each format
+FORMAT_EXTENSIONS = {
+    'csv': ["csv"],
+    'parquet': ["parquet", "pq"],
+    'arrow': ["arrow", "feather", "ipc"]
+}
+
+MIME_TYPES = {
+    'csv': "text/csv",
+    'parquet': "application/vnd.apache.parquet",
+    'arrow': "application/vnd.apache.arrow.file"
+}
+
+# Extra column carrying per-row failures in columnar output, where the
+# prediction column must stay numeric
+ERROR_COLUMN = "Prediction_Error"
+
+# Arrow types of the columns scoring adds, as pyarrow type aliases
+RESULT_COLUMN_TYPES = {
+    'Predicted_Delivery_Time': "float64",
+    'Confidence_Lower': "float64",
+    'Confidence_Upper': "float64",
+    ERROR_COLUMN: "string"
+}
+
+
+def _require_pyarrow(file_format):
+    if pa is None:
+        raise ImportError(f"Reading and writing {file_format} files requires pyarrow (pip install pyarrow)")
+
+
+def detect_format(filename, default="csv"):
+    """Return the batch format implied by a file name's extension"""
+    extension = os.path.splitext(str(filename))[1].lstrip(".").lower()
+    for file_format, extensions in FORMAT_EXTENSIONS.items():
+        if extension in extensions:
+            return file_format
+    return default
+
+
+def _check_columns(available, columns):
+    missing_columns = [col for col in columns if col not in available]
+    if missing_columns:
+        raise ValueError(f"Missing columns: {missing_columns}")
+
+
+def _open_arrow(source):
+    """Open an Arrow IPC file, falling back to the streaming IPC format"""
+    if hasattr(source, "seek"):
+        source.seek(0)
+    try:
+        return ipc.open_file(source)
+    except pa.ArrowInvalid:
+        if hasattr(source, "seek"):
+            source.seek(0)
+        return ipc.open_stream(source)
+
+
+def read_schema_columns(source, file_format):
+    """Return the column names of a batch file without reading its rows"""
+    if file_format == "csv":
+        columns = list(pd.read_csv(source, nrows=0).columns)
+    else:
+        _require_pyarrow(file_format)
+        if file_format == "parquet":
+            columns = pq.ParquetFile(source).schema_arrow.names
+        else:
+            columns = _open_arrow(source).schema.names
+    if hasattr(source, "seek"):
+        source.seek(0)
+    return columns
+
+
+def read_batch(source, file_format="csv", columns=None):
+    """Read a whole batch file into a DataFrame
+
+    For Parquet and Arrow only ``columns`` are read when given; CSV files keep
+    every column so the results carry the caller's extra fields through.
+    """
+    if file_format == "csv":
+        df = pd.read_csv(source)
+        if columns is not None:
+            _check_columns(df.columns, columns)
+        return df
+
+    _require_pyarrow(file_format)
+    if file_format == "parquet":
+        parquet_file = pq.ParquetFile(source)
+        if columns is not None:
+            _check_columns(parquet_file.schema_arrow.names, columns)
+        table = parquet_file.read(columns=columns)
+    elif file_format == "arrow":
+        table = _open_arrow(source).read_all()
+        if columns is not None:
+            _check_columns(table.column_names, columns)
+            table = table.select(columns)
+    else:
+        raise ValueError(f"Unsupported batch format: {file_format}")
+    return table.to_pandas()
+
+
+def iter_batches(source, file_format="csv", columns=None, chunksize=50000):
+    """Yield a batch file as DataFrames of at most ``chunksize`` rows"""
+    if file_format == "csv":
+        for index, chunk in enumerate(pd.read_csv(source, chunksize=chunksize)):
+            if index == 0 and columns is not None:
+                _check_columns(chunk.columns, columns)
+            yield chunk
+        return
+
+    _require_pyarrow(file_format)
+    if file_format == "parquet":
+        parquet_file = pq.ParquetFile(source)
+        if columns is not None:
+            _check_columns(parquet_file.schema_arrow.names, columns)
+        batches = parquet_file.iter_batches(batch_size=chunksize, columns=columns)
+    elif file_format == "arrow":
+        reader = _open_arrow(source)
+        if columns is not None:
+            _check_columns(reader.schema.names, columns)
+        if isinstance(reader, ipc.RecordBatchFileReader):
+            batches = (reader.get_batch(i) for i in range(reader.num_record_batches))
+        else:
+            batches = reader
+    else:
+        raise ValueError(f"Unsupported batch format: {file_format}")
+
+    for batch in batches:
+        if columns is not None:
+            batch = batch.select(columns)
+        # IPC record batches can be larger than chunksize
+        for start in range(0, batch.num_rows, chunksize):
+            yield batch.slice(start, chunksize).to_pandas()
+
+
+def _columnar_frame(df):
+    """Split string errors out of the prediction column so it stays numeric"""
+    if 'Predicted_Delivery_Time' not in df.columns:
+        return df
+    df = df.copy()
+    predictions = df['Predicted_Delivery_Time']
+    failed = predictions.map(lambda value: isinstance(value, str)).to_numpy(dtype=bool)
+    errors = np.full(len(df), None, dtype=object)
+    errors[failed] = predictions[failed].to_numpy()
+    df['Predicted_Delivery_Time'] = pd.to_numeric(predictions.where(~failed), errors='coerce').astype(float)
+    df[ERROR_COLUMN] = pd.array(errors, dtype="string")
+    return df
+
+
+def _to_table(df, schema=None):
+    # Object columns of mixed types cannot be typed; store them as strings
+    df = df.copy()
+    for col in df.columns:
+        if df[col].dtype == object and pd.api.types.infer_dtype(df[col], skipna=True) not in ("string", "empty"):
+            df[col] = df[col].astype("string")
+    return pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+
+
+def write_batch(df, destination, file_format="csv"):
+    """Write a scored DataFrame to a path or binary stream"""
+    if file_format == "csv":
+        df.to_csv(destination, index=False)
+        return
+
+    _require_pyarrow(file_format)
+    table = _to_table(_columnar_frame(df))
+    if file_format == "parquet":
+        pq.write_table(table, destination)
+    elif file_format == "arrow":
+        with ipc.new_file(destination, table.schema) as writer:
+            writer.write_table(table)
+    else:
+        raise ValueError(f"Unsupported batch format: {file_format}")
+
+
+def batch_to_bytes(df, file_format="csv"):
+    """Serialize a scored DataFrame for download"""
+    if file_format == "csv":
+        return df.to_csv(index=False).encode("utf-8")
+    buffer = io.BytesIO()
+    write_batch(df, buffer, file_format)
+    return buffer.getvalue()
+
+
+def _conform(df, column_types):
+    """Coerce columns to their declared types so every chunk fits one schema"""
+    df = df.copy()
+    for col, type_name in column_types.items():
+        if col not in df.columns:
+            continue
+        if type_name == "string":
+            df[col] = df[col].astype("string")
+        else:
+            # Values that do not parse become null; the row's error says why
+            df[col] = pd.to_numeric(df[col], errors='coerce').astype(type_name)
+    return df
+
+
+def _output_schema(df, table, column_types):
+    """Schema of a columnar output: declared types, the rest inferred from the first chunk
+
+    Columns that are all null in the first chunk (which CSV reads as float
+    NaN) are typed as strings and integer columns as float64, so later chunks
+    with values or gaps still fit.
+    """
+    empty = set(df.columns[df.isna().all().to_numpy()])
+    fields = []
+    for field in table.schema:
+        if field.name in column_types:
+            fields.append(pa.field(field.name, pa.type_for_alias(column_types[field.name])))
+        elif field.name in empty or pa.types.is_null(field.type):
+            fields.append(pa.field(field.name, pa.string()))
+        elif pa.types.is_integer(field.type):
+            fields.append(pa.field(field.name, pa.float64()))
+        else:
+            fields.append(field)
+    return pa.schema(fields)
+
+
+class BatchWriter:
+    """Append scored chunks to one CSV, Parquet or Arrow IPC output
+
+    The schema of columnar outputs is set up front from ``column_types`` (a
+    mapping of column name to pyarrow type alias, e.g. the input columns'
+    dtypes) and RESULT_COLUMN_TYPES; only other columns are inferred from
+    the first chunk. Every chunk is coerced to that schema.
+    """
+
+    def __init__(self, destination, file_format="csv", column_types=None):
+        if file_format not in BATCH_FORMATS:
+            raise ValueError(f"Unsupported batch format: {file_format}")
+        if file_format != "csv":
+            _require_pyarrow(file_format)
+        self.destination = destination
+        self.file_format = file_format
+        self.chunks = 0
+        self.column_types = dict(column_types or {}, **RESULT_COLUMN_TYPES)
+        self._writer = None
+        self._schema = None
+
+    def write(self, chunk):
+        if self.file_format == "csv":
+            chunk.to_csv(self.destination, header=self.chunks == 0, index=False,
+                         mode='w' if self.chunks == 0 else 'a')
+        else:
+            frame = _conform(_columnar_frame(chunk), self.column_types)
+            if self._writer is None:
+                table = _to_table(frame)
+                self._schema = _output_schema(frame, table, self.column_types)
+                table = table.cast(self._schema)
+                if self.file_format == "parquet":
+                    self._writer = pq.ParquetWriter(self.destination, self._schema)
+                else:
+                    self._writer = ipc.new_file(self.destination, self._schema)
+            else:
+                table = _to_table(frame, self._schema)
+            self._writer.write_table(table)
+        self.chunks += 1
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,308 @@
+import hashlib
+import os
+import threading
+
+import numpy as np
+
+# Upper bound on (row, tree) pairs traversed at once; keeps scratch memory flat
+MAX_PAIRS_PER_CHUNK = 1 << 20
+
+# Largest input HybridForest sends to the compiled forest; bigger frames go to
+# sklearn. On the reference host (100 trees) the compiled forest won up to 1000
+# rows and sklearn from 3000; re-measure with benchmarks/run_benchmarks.py --cutover
+COMPACT_FOREST_MAX_ROWS = int(os.environ.get("COMPACT_FOREST_MAX_ROWS", "2000"))
+
+
+def smallest_int_dtype(min_value, max_value):
+    """Return the narrowest signed integer dtype holding [min_value, max_value]"""
+    for dtype in (np.int8, np.int16, np.int32, np.int64):
+        info = np.iinfo(dtype)
+        if info.min <= min_value and max_value <= info.max:
+            return np.dtype(dtype)
+    raise ValueError(f"No integer dtype holds [{min_value}, {max_value}]")
+
+
+def round_down_float32(values):
+    """Round float64 values to the largest float32 not above each of them
+
+    Inputs are compared as float32, so for any float32 x, ``x <= t`` holds
+    exactly when ``x <= round_down_float32(t)``: split decisions are unchanged.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    rounded = values.astype(np.float32)
+    above = rounded.astype(np.float64) > values
+    rounded[above] = np.nextafter(rounded[above], np.float32(-np.inf))
+    return rounded
+
+
+def sklearn_forest_nbytes(model):
+    """Bytes held by the node and value arrays of a fitted sklearn forest"""
+    total = 0
+    for estimator in model.estimators_:
+        state = estimator.tree_.__getstate__()
+        total += state["nodes"].nbytes + state["values"].nbytes
+    return total
+
+
+class CompactForest:
+    """Random forest flattened into contiguous node tables
+
+    All trees share one struct-of-arrays layout (feature index, threshold,
+    children, leaf value), with ``roots`` holding the index of each tree's
+    first node. ``children`` is an (n_nodes, 2) table of [right, left] child
+    indices so the split outcome can index it directly; leaves have -1
+    children, as in scikit-learn. Predictions match
+    ``RandomForestRegressor.predict``.
+    """
+
+    def __init__(self, feature, threshold, children, value, roots, n_features,
+                 missing_go_left=None, version=None):
+        self.feature = feature
+        self.threshold = threshold
+        self.children = children
+        self.value = value
+        self.roots = roots
+        self.n_features = int(n_features)
+        self.missing_go_left = missing_go_left
+        self._version = version
+
+    @property
+    def n_estimators(self):
+        return len(self.roots)
+
+    @property
+    def n_nodes(self):
+        return len(self.feature)
+
+    @property
+    def version(self):
+        """Content hash of the node tables, used to key cached predictions"""
+        if self._version is None:
+            digest = hashlib.blake2b(digest_size=12)
+            for array in (self.feature, self.threshold, self.children, self.value, self.roots):
+                digest.update(np.ascontiguousarray(array).tobytes())
+            self._version = digest.hexdigest()
+        return self._version
+
+    @property
+    def nbytes(self):
+        """Bytes held by the node tables"""
+        arrays = (self.feature, self.threshold, self.children, self.value, self.roots,
+                  self.missing_go_left)
+        return sum(array.nbytes for array in arrays if array is not None)
+
+    @property
+    def children_left(self):
+        return self.children[:, 1]
+
+    @property
+    def children_right(self):
+        return self.children[:, 0]
+
+    @classmethod
+    def from_sklearn(cls, model):
+        """Flatten a fitted single-output RandomForestRegressor"""
+        if not hasattr(model, "estimators_"):
+            raise TypeError(f"Cannot compile model of type {type(model).__name__}")
+
+        trees = [estimator.tree_ for estimator in model.estimators_]
+        if any(tree.n_outputs != 1 for tree in trees):
+            raise TypeError("Only single-output forests can be compiled")
+
+        node_counts = np.array([tree.node_count for tree in trees], dtype=np.int64)
+        roots = np.concatenate(([0], np.cumsum(node_counts)[:-1]))
+        index_dtype = np.int32 if node_counts.sum() < np.iinfo(np.int32).max else np.int64
+
+        def offset_children(children, offset):
+            # Leaves keep -1; internal children shift into the shared node table
+            return np.where(children == -1, -1, children + offset)
+
+        feature = np.concatenate([np.maximum(tree.feature, 0) for tree in trees]).astype(index_dtype)
+        threshold = np.concatenate([tree.threshold for tree in trees]).astype(np.float64)
+        children = np.empty((node_counts.sum(), 2), dtype=index_dtype)
+        children[:, 0] = np.concatenate([
+            offset_children(tree.children_right, offset) for tree, offset in zip(trees, roots)
+        ])
+        children[:, 1] = np.concatenate([
+            offset_children(tree.children_left, offset) for tree, offset in zip(trees, roots)
+        ])
+        value = np.concatenate([tree.value[:, 0, 0] for tree in trees]).astype(np.float64)
+
+        missing_go_left = None
+        if all(hasattr(tree, "missing_go_to_left") for tree in trees):
+            missing_go_left = np.concatenate([tree.missing_go_to_left for tree in trees]).astype(bool)
+
+        return cls(feature, threshold, children, value, roots.astype(index_dtype),
+                   model.n_features_in_, missing_go_left)
+
+    def compact(self):
+        """Return a copy using float32 thresholds and leaf values and minimal index types
+
+        Thresholds are rounded down to float32, so every split decision is the
+        same; only leaf values lose precision (relative error below 6e-8 each).
+        Feature and child indices use the narrowest integer type that fits.
+        """
+        index_dtype = smallest_int_dtype(-1, max(self.n_nodes - 1, 0))
+        missing_go_left = self.missing_go_left
+        if missing_go_left is not None and not missing_go_left.any():
+            # No split sends missing values left; the default traversal already goes right
+            missing_go_left = None
+
+        return CompactForest(
+            self.feature.astype(smallest_int_dtype(0, max(self.n_features - 1, 0))),
+            round_down_float32(self.threshold),
+            self.children.astype(index_dtype),
+            self.value.astype(np.float32),
+            self.roots.astype(index_dtype),
+            self.n_features,
+            missing_go_left
+        )
+
+    def _check_input(self, X):
+        """Convert X to the contiguous float32 matrix the trees were split on"""
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(
+                f"X has shape {X.shape}, but the forest expects {self.n_features} features"
+            )
+        return X
+
+    def _leaf_values(self, X, roots, out):
+        """Traverse every (row, tree) pair level by level and write leaf values into out"""
+        n_rows, n_features = X.shape
+        n_trees = len(roots)
+        flat_X = X.ravel()
+        check_missing = self.missing_go_left is not None and np.isnan(flat_X).any()
+
+        # One slot per (tree, row) pair, laid out tree-major to match out
+        node = np.repeat(roots, n_rows).astype(np.intp)
+        row_offset = np.tile(np.arange(n_rows, dtype=np.intp) * n_features, n_trees)
+        flat_children = self.children.ravel()
+
+        # Only pairs still sitting on an internal node are advanced each level
+        active = np.flatnonzero(flat_children[2 * node] != -1)
+        while active.size:
+            current = node[active]
+            x = flat_X[row_offset[active] + self.feature[current]]
+            go_left = x <= self.threshold[current]
+            if check_missing:
+                go_left |= np.isnan(x) & self.missing_go_left[current]
+            # Children may be stored narrower than intp; widen before doubling
+            current = flat_children[2 * current + go_left].astype(np.intp, copy=False)
+            node[active] = current
+            active = active[flat_children[2 * current] != -1]
+
+        out[:] = self.value[node].reshape(n_trees, n_rows)
+
+    def _row_chunks(self, n_rows, n_trees):
+        """Yield (start, stop) row ranges holding at most MAX_PAIRS_PER_CHUNK pairs"""
+        rows_per_chunk = max(1, MAX_PAIRS_PER_CHUNK // max(n_trees, 1))
+        for start in range(0, n_rows, rows_per_chunk):
+            yield start, min(start + rows_per_chunk, n_rows)
+
+    def predict_per_tree(self, X, n_trees=None):
+        """Return each tree's predictions as an (n_trees, n_rows) array
+
+        ``n_trees`` limits evaluation to the first n estimators.
+        """
+        X = self._check_input(X)
+        roots = self.roots if n_trees is None else self.roots[:n_trees]
+        tree_predictions = np.empty((len(roots), X.shape[0]), dtype=np.float64)
+
+        for start, stop in self._row_chunks(X.shape[0], len(roots)):
+            self._leaf_values(X[start:stop], roots, tree_predictions[:, start:stop])
+
+        return tree_predictions
+
+    def predict(self, X, n_trees=None):
+        """Predict the forest mean for every row of X
+
+        Works chunk by chunk, so memory stays bounded for large inputs.
+        """
+        X = self._check_input(X)
+        roots = self.roots if n_trees is None else self.roots[:n_trees]
+        predictions = np.empty(X.shape[0], dtype=np.float64)
+
+        for start, stop in self._row_chunks(X.shape[0], len(roots)):
+            leaves = np.empty((len(roots), stop - start), dtype=np.float64)
+            self._leaf_values(X[start:stop], roots, leaves)
+            # Accumulate trees strictly in order, like sklearn's single-threaded
+            # predict (sum() would switch to pairwise summation for one row)
+            predictions[start:stop] = np.cumsum(leaves, axis=0)[-1] / len(roots)
+
+        return predictions
+
+
+class HybridForest:
+    """Routes each call to the faster engine for its input size
+
+    The compiled forest has far less per-call overhead, so single orders and
+    small frames go to it; sklearn's compiled traversal has better throughput,
+    so frames above ``max_rows`` go to the estimator. The estimator can be
+    given directly or as a zero-argument loader, called on the first large
+    frame (e.g. to keep the memory-mapped forest's fast startup).
+    ``estimator_path`` names the joblib file the estimator comes from, so
+    worker processes can memory-map it instead of receiving a copy.
+    """
+
+    def __init__(self, forest, estimator=None, max_rows=COMPACT_FOREST_MAX_ROWS, load_estimator=None,
+                 estimator_path=None):
+        self.forest = forest
+        self.max_rows = max_rows
+        self.estimator_path = estimator_path
+        self._estimator = estimator
+        self._load_estimator = load_estimator
+        self._lock = threading.Lock()
+
+    @property
+    def version(self):
+        return self.forest.version
+
+    @property
+    def n_estimators(self):
+        return self.forest.n_estimators
+
+    @property
+    def n_features(self):
+        return self.forest.n_features
+
+    @property
+    def estimator(self):
+        """The sklearn estimator, loaded on first use; None if unavailable"""
+        if self._estimator is None and self._load_estimator is not None:
+            with self._lock:
+                if self._estimator is None and self._load_estimator is not None:
+                    self._estimator = self._load_estimator()
+                    self._load_estimator = None
+        return self._estimator
+
+    def _use_estimator(self, X):
+        return len(X) > self.max_rows and self.estimator is not None
+
+    def predict_per_tree(self, X, n_trees=None):
+        """Return each tree's predictions as an (n_trees, n_rows) array"""
+        if not self._use_estimator(X):
+            return self.forest.predict_per_tree(X, n_trees)
+        # Import at function level to avoid circular imports
+        from utils.analytics import predict_per_tree
+        return predict_per_tree(self.estimator, X, n_trees=n_trees)
+
+    def predict(self, X, n_trees=None):
+        """Predict the forest mean for every row of X"""
+        if not self._use_estimator(X):
+            return self.forest.predict(X, n_trees)
+        if n_trees is None:
+            return self.estimator.predict(np.asarray(X, dtype=np.float32))
+        return self.predict_per_tree(X, n_trees).mean(axis=0)
+
+
+def compile_forest(model):
+    """Return a CompactForest for sklearn forests, or the model unchanged"""
+    if isinstance(model, CompactForest):
+        return model
+    if isinstance(model, HybridForest):
+        return model.forest
+    try:
+        return CompactForest.from_sklearn(model)
+    except (TypeError, AttributeError):
+        return model
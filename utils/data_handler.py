@@ -1,44 +1,131 @@
+import functools
+import os
+import time
 import joblib
 import pandas as pd
 import numpy as np
-import streamlit as st
+from utils.feature_pipeline import FeaturePipeline
+from utils.compact_forest import CompactForest, HybridForest, compile_forest
+from utils.model_store import is_forest_dir, load_forest
+from utils.prediction_cache import get_prediction_cache
+from utils.batch_io import read_batch, iter_batches, BatchWriter
+from utils.tracing import traced, span
+from utils.metrics import PREDICTIONS, BATCH_ROWS, CACHE_LOOKUPS, MODEL_LOAD_SECONDS
+from utils.analytics import predict_with_uncertainty, calculate_confidence_interval
+
+# Column lists as used during training
+NUM_COLS = [
+    "Delivery_person_Age",
+    "Delivery_person_Ratings",
+    "Vehicle_condition",
+    "multiple_deliveries",
+    "distance_km",
+    "prep_time_min",
+    "order_hour",
+    "order_day",
+    "is_weekend"
+]
+
+CAT_COLS = [
+    "Weatherconditions",
+    "Road_traffic_density",
+    "Type_of_order",
+    "Type_of_vehicle",
+    "Festival",
+    "City"
+]
+
+# Columns every batch upload must provide
+REQUIRED_COLUMNS = [
+    "Delivery_person_Age", "Delivery_person_Ratings", "Weatherconditions",
+    "Road_traffic_density", "Vehicle_condition", "Type_of_order",
+    "Type_of_vehicle", "multiple_deliveries", "Festival", "City",
+    "distance_km", "prep_time_min", "order_hour", "order_day", "is_weekend"
+]
+
+# Output types of the required columns in columnar batch results
+REQUIRED_COLUMN_TYPES = {col: "float64" for col in NUM_COLS}
+REQUIRED_COLUMN_TYPES.update({col: "string" for col in CAT_COLS})
+
+# Rows scored per chunk in streaming batch mode
+DEFAULT_CHUNK_SIZE = 50000
+
+# Inference tiers: "full" evaluates every tree, "fast" only the first
+# FAST_MODE_TREES (set via the environment) for interactive previews
+INFERENCE_TIERS = ["full", "fast"]
+FAST_MODE_TREES = int(os.environ.get("FAST_MODE_TREES", "50"))
+
+# Compiled feature pipelines keyed by the (encoder, scaler) pair they were built from
+_feature_pipelines = {}
 
 def load_models():
     """Load the trained models and preprocessors"""
     try:
+        start = time.perf_counter()
         encoder = joblib.load("encoder.pkl")
         scaler = joblib.load("scaler.pkl")
-        model = joblib.load("rf_model.pkl")
+        
+        # Prefer the memory-mapped forest: near-instant load, pages shared across processes
+        estimator_path = os.path.abspath("rf_model.pkl")
+        if is_forest_dir("rf_model.forest"):
+            forest = load_forest("rf_model.forest")
+            # The sklearn estimator for large frames is only unpickled once one arrives
+            if os.path.exists(estimator_path):
+                model = HybridForest(forest, load_estimator=functools.partial(joblib.load, estimator_path),
+                                     estimator_path=estimator_path)
+            else:
+                model = HybridForest(forest)
+        else:
+            # Small inputs use flattened NumPy node tables, large frames the sklearn forest
+            estimator = joblib.load(estimator_path)
+            forest = compile_forest(estimator)
+            model = HybridForest(forest, estimator, estimator_path=estimator_path) \
+                if isinstance(forest, CompactForest) else estimator
+        
+        # Resolve the version used in prediction cache keys up front
+        get_model_version(model)
+        
+        # Compile the preprocessing once so predictions skip sklearn's transforms
+        get_feature_pipeline(encoder, scaler)
+        
+        MODEL_LOAD_SECONDS.observe(time.perf_counter() - start)
         return encoder, scaler, model
     except FileNotFoundError as e:
         raise Exception(f"Model file not found: {str(e)}")
     except Exception as e:
         raise Exception(f"Error loading models: {str(e)}")
 
-def prepare_input_data(input_data, encoder, scaler):
-    """Prepare input data for prediction"""
-    # Column lists as used during training
-    num_cols = [
-        "Delivery_person_Age",
-        "Delivery_person_Ratings",
-        "Vehicle_condition",
-        "multiple_deliveries",
-        "distance_km",
-        "prep_time_min",
-        "order_hour",
-        "order_day",
-        "is_weekend"
-    ]
-    
-    cat_cols = [
-        "Weatherconditions",
-        "Road_traffic_density",
-        "Type_of_order",
-        "Type_of_vehicle",
-        "Festival",
-        "City"
-    ]
+def get_feature_pipeline(encoder, scaler):
+    """Return the compiled FeaturePipeline for an encoder/scaler pair
+
+    Returns None when the preprocessors cannot be compiled, in which case
+    prepare_input_data falls back to the sklearn transforms.
+    """
+    key = (id(encoder), id(scaler))
+    entry = _feature_pipelines.get(key)
+    if entry is None:
+        try:
+            pipeline = FeaturePipeline.from_fitted(encoder, scaler, NUM_COLS, CAT_COLS)
+        except TypeError:
+            pipeline = None
+        # Keep references to the preprocessors so their ids stay unique
+        entry = (encoder, scaler, pipeline)
+        _feature_pipelines[key] = entry
+    return entry[2]
+
+@traced()
+def prepare_input_data(input_data, encoder, scaler, out=None):
+    """Prepare input data for prediction
+
+    Uses the compiled FeaturePipeline when available; ``out`` is an optional
+    preallocated (n_rows, n_features) float array to write the features into.
+    """
+    pipeline = get_feature_pipeline(encoder, scaler)
+    if pipeline is not None:
+        return pipeline.transform(input_data, out=out)
     
+    num_cols = NUM_COLS
+    cat_cols = CAT_COLS
 
     # Normalize categorical values to lowercase
     for col in cat_cols:
@@ -57,11 +144,68 @@ def prepare_input_data(input_data, encoder, scaler):
     
     return final_input
 
+@traced()
 def make_prediction(model, final_input):
     """Make prediction using the trained model"""
     prediction = model.predict(final_input)[0]
     return prediction
 
+def count_trees(model):
+    """Return the number of trees in a forest model, or None for other models"""
+    if hasattr(model, 'estimators_'):
+        return len(model.estimators_)
+    n_estimators = getattr(model, 'n_estimators', None)
+    return n_estimators if isinstance(n_estimators, int) else None
+
+def tree_budget(model, tier="full", fast_trees=None):
+    """Return the number of trees to evaluate for an inference tier
+
+    None means the full ensemble, which stays the default for final and batch
+    scoring. Non-forest models always use the full model.
+    """
+    if tier not in INFERENCE_TIERS:
+        raise ValueError(f"Unknown inference tier: {tier}")
+    n_estimators = count_trees(model)
+    if tier == "full" or n_estimators is None:
+        return None
+    return max(1, min(fast_trees or FAST_MODE_TREES, n_estimators))
+
+def get_model_version(model):
+    """Return an identifier that changes whenever the loaded model changes"""
+    version = getattr(model, 'version', None)
+    if version is None:
+        version = f"{type(model).__name__}-{id(model)}"
+    return version
+
+@traced()
+def predict_with_cache(input_data, encoder, scaler, model, cache=None, n_trees=None):
+    """Predict one order with its confidence interval, memoized on its features
+
+    The cache key is the model version, tree budget and the normalized
+    15-feature vector, so inputs that differ only in casing or spacing share
+    an entry. ``n_trees`` evaluates only the first n trees (see tree_budget).
+    Returns ``(prediction, (lower, upper))``.
+    """
+    if cache is None:
+        cache = get_prediction_cache()
+    
+    final_input = prepare_input_data(input_data, encoder, scaler)
+    key = (get_model_version(model), n_trees, tuple(final_input[0].tolist()))
+    
+    with span("prediction_cache_lookup") as record:
+        cached = cache.get(key)
+        if record is not None:
+            record['args']['hit'] = cached is not None
+    CACHE_LOOKUPS.inc(result="hit" if cached is not None else "miss")
+    PREDICTIONS.inc(kind="single")
+    if cached is not None:
+        return cached
+    
+    result = predict_with_uncertainty(model, final_input, n_trees=n_trees)
+    value = (float(result['mean'][0]), (float(result['lower'][0]), float(result['upper'][0])))
+    cache.put(key, value)
+    return value
+
 def validate_input_data(data):
     """Validate input data for common issues"""
     issues = []
@@ -82,43 +226,200 @@ def validate_input_data(data):
     
     return issues
 
-def process_batch_data(uploaded_file, encoder, scaler, model):
-    """Process batch data for multiple predictions"""
+def predict_frame(df, encoder, scaler, model, include_confidence=False):
+    """Score every row of a DataFrame with one encode, scale and predict call
+
+    Returns a DataFrame aligned with ``df`` holding 'Predicted_Delivery_Time'
+    (the prediction, or an ``"Error: ..."`` string for rows that cannot be
+    scored, same as scoring the row on its own). With ``include_confidence``
+    the 'Confidence_Lower' and 'Confidence_Upper' bounds are computed from the
+    same forest pass.
+    """
+    # Work on a copy so the caller's categorical columns keep their original casing
+    # when the sklearn fallback path normalizes them
+    features = df[REQUIRED_COLUMNS].copy()
+
+    # Rows with non-numeric or non-finite numeric values fail on their own;
+    # keep them out of the vectorized call
+    numeric = features[NUM_COLS].apply(pd.to_numeric, errors='coerce')
+    valid = np.isfinite(numeric.to_numpy(dtype=float)).all(axis=1)
+
+    predictions = np.empty(len(features), dtype=object)
+    lower = np.full(len(features), np.nan)
+    upper = np.full(len(features), np.nan)
+
+    if valid.any():
+        try:
+            final_input = prepare_input_data(features[valid].copy(), encoder, scaler)
+            if include_confidence:
+                result = predict_with_uncertainty(model, final_input)
+                predictions[valid] = result['mean']
+                lower[valid] = result['lower']
+                upper[valid] = result['upper']
+            else:
+                predictions[valid] = model.predict(final_input)
+        except Exception:
+            # Fall back to row-by-row scoring so each row gets its own result
+            valid[:] = False
+
+    # Score the remaining rows one at a time to reproduce their individual outcome
+    for position in np.flatnonzero(~valid):
+        try:
+            row_data = features.iloc[[position]].copy()
+            final_input = prepare_input_data(row_data, encoder, scaler)
+            predictions[position] = make_prediction(model, final_input)
+            if include_confidence:
+                lower[position], upper[position] = calculate_confidence_interval(model, final_input)
+        except Exception as e:
+            predictions[position] = f"Error: {str(e)}"
+
+    results = pd.DataFrame(index=df.index)
+    results['Predicted_Delivery_Time'] = predictions.astype(float) if valid.all() else predictions
+    if include_confidence:
+        results['Confidence_Lower'] = lower
+        results['Confidence_Upper'] = upper
+    return results
+
+def process_batch_data(uploaded_file, encoder, scaler, model, include_confidence=False, n_workers=1,
+                       file_format="csv"):
+    """Process batch data for multiple predictions
+
+    ``file_format`` is "csv", "parquet" or "arrow"; columnar files are read
+    projected to the required columns. With ``n_workers`` above one, large
+    files are split into shards scored in a process pool (see
+    utils.parallel_scoring).
+    """
     try:
-        # Read the uploaded file
-        df = pd.read_csv(uploaded_file)
-        
-        # Validate columns
-        required_columns = [
-            "Delivery_person_Age", "Delivery_person_Ratings", "Weatherconditions",
-            "Road_traffic_density", "Vehicle_condition", "Type_of_order",
-            "Type_of_vehicle", "multiple_deliveries", "Festival", "City",
-            "distance_km", "prep_time_min", "order_hour", "order_day", "is_weekend"
-        ]
+        # Read the uploaded file, validating the required columns
+        df = read_batch(uploaded_file, file_format, columns=REQUIRED_COLUMNS)
         
-        missing_columns = [col for col in required_columns if col not in df.columns]
-        if missing_columns:
-            raise ValueError(f"Missing columns: {missing_columns}")
+        # Score the whole frame at once
+        if n_workers > 1:
+            # Import at function level to avoid circular imports
+            from utils.parallel_scoring import predict_frame_parallel
+            results = predict_frame_parallel(df, encoder, scaler, model, n_workers,
+                                             include_confidence=include_confidence)
+        else:
+            results = predict_frame(df, encoder, scaler, model, include_confidence)
+        for col in results.columns:
+            df[col] = results[col]
         
-        # Process each row
-        predictions = []
-        for idx, row in df.iterrows():
-            try:
-                row_data = pd.DataFrame([row])
-                final_input = prepare_input_data(row_data, encoder, scaler)
-                prediction = make_prediction(model, final_input)
-                predictions.append(prediction)
-            except Exception as e:
-                predictions.append(f"Error: {str(e)}")
-        
-        # Add predictions to dataframe
-        df['Predicted_Delivery_Time'] = predictions
+        scored = int(pd.to_numeric(df['Predicted_Delivery_Time'], errors='coerce').notna().sum())
+        PREDICTIONS.inc(len(df), kind="batch")
+        BATCH_ROWS.inc(scored, outcome="scored")
+        BATCH_ROWS.inc(len(df) - scored, outcome="failed")
         
         return df
         
     except Exception as e:
         raise Exception(f"Error processing batch data: {str(e)}")
 
+def _stream_size(source):
+    """Return the total size of a seekable stream, or None if it is unknown"""
+    try:
+        position = source.tell()
+        source.seek(0, 2)
+        size = source.tell()
+        source.seek(position)
+        return size
+    except (AttributeError, OSError, ValueError):
+        return None
+
+def iter_batch_chunks(source, encoder, scaler, model, chunksize=DEFAULT_CHUNK_SIZE,
+                      include_confidence=False, scorer=None, file_format="csv"):
+    """Read, validate and score a batch upload in fixed-size chunks
+
+    Yields one scored DataFrame per chunk so only ``chunksize`` rows are held
+    in memory at a time. Chunks are scored by ``scorer`` (a ParallelScorer)
+    when given, otherwise in this process.
+    """
+    for chunk in iter_batches(source, file_format, REQUIRED_COLUMNS, chunksize):
+        if scorer is not None:
+            results = scorer.predict_frame(chunk, include_confidence)
+        else:
+            results = predict_frame(chunk, encoder, scaler, model, include_confidence)
+        for col in results.columns:
+            chunk[col] = results[col]
+        yield chunk
+
+def process_batch_stream(source, destination, encoder, scaler, model,
+                         chunksize=DEFAULT_CHUNK_SIZE, progress_callback=None,
+                         include_confidence=False, n_workers=1,
+                         file_format="csv", output_format="csv"):
+    """Score a batch upload chunk by chunk and append the results to destination
+
+    ``destination`` is a path or writable stream receiving ``output_format``
+    output (a text stream for CSV, a binary one otherwise).
+    ``progress_callback(chunks_done, rows_done, fraction)`` is called after each
+    chunk; ``fraction`` is the share of the input consumed, or None when the
+    input size is unknown. With ``n_workers`` above one each chunk is sharded
+    across one process pool kept for the whole run, when the model has a
+    compiled forest to share. Returns summary statistics gathered on the fly.
+    """
+    total_size = _stream_size(source)
+    summary = {
+        'total_orders': 0,
+        'scored_orders': 0,
+        'failed_orders': 0,
+        'chunks': 0,
+        'average_time': None,
+        'min_time': None,
+        'max_time': None
+    }
+    prediction_sum = 0.0
+    scorer = None
+    writer = None
+
+    try:
+        if n_workers > 1:
+            # Import at function level to avoid circular imports
+            from utils.parallel_scoring import ParallelScorer, can_score_in_workers, shard_size_for
+            # Models without a compiled forest are scored in this process
+            if can_score_in_workers(model):
+                shard_size = shard_size_for(chunksize, n_workers)
+                scorer = ParallelScorer(encoder, scaler, model, n_workers, shard_size)
+
+        writer = BatchWriter(destination, output_format, REQUIRED_COLUMN_TYPES)
+        for chunk in iter_batch_chunks(source, encoder, scaler, model, chunksize,
+                                       include_confidence, scorer, file_format):
+            writer.write(chunk)
+
+            predictions = pd.to_numeric(chunk['Predicted_Delivery_Time'], errors='coerce').dropna()
+            summary['chunks'] += 1
+            summary['total_orders'] += len(chunk)
+            summary['scored_orders'] += len(predictions)
+            summary['failed_orders'] += len(chunk) - len(predictions)
+            PREDICTIONS.inc(len(chunk), kind="batch")
+            BATCH_ROWS.inc(len(predictions), outcome="scored")
+            BATCH_ROWS.inc(len(chunk) - len(predictions), outcome="failed")
+            if len(predictions):
+                prediction_sum += float(predictions.sum())
+                chunk_min, chunk_max = float(predictions.min()), float(predictions.max())
+                summary['min_time'] = chunk_min if summary['min_time'] is None else min(summary['min_time'], chunk_min)
+                summary['max_time'] = chunk_max if summary['max_time'] is None else max(summary['max_time'], chunk_max)
+
+            if progress_callback is not None:
+                fraction = None
+                if total_size:
+                    try:
+                        fraction = min(source.tell() / total_size, 1.0)
+                    except (AttributeError, OSError, ValueError):
+                        fraction = None
+                progress_callback(summary['chunks'], summary['total_orders'], fraction)
+
+        if summary['scored_orders']:
+            summary['average_time'] = prediction_sum / summary['scored_orders']
+
+        return summary
+
+    except Exception as e:
+        raise Exception(f"Error processing batch data: {str(e)}")
+    finally:
+        if writer is not None:
+            writer.close()
+        if scorer is not None:
+            scorer.close()
+
 def create_sample_batch_data():
     """Create sample data for batch processing"""
     sample_data = {
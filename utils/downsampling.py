@@ -0,0 +1,153 @@
+"""Incremental min/max downsampling of the prediction time series
+
+Points are grouped into buckets of consecutive predictions. Each bucket keeps
+its first, minimum, maximum and last point (M4 aggregation), which preserves
+the visible envelope of a line chart. When the buckets would exceed the point
+budget, neighbours are merged pairwise and the bucket width doubles, so
+appends are amortized O(1) and the chart payload stays bounded::
+
+    timeline = PredictionTimeline(budget=2000)
+    timeline.append(datetime.now(), 31.2)
+    index, timestamps, values = timeline.series('prediction')
+"""
+import os
+from collections import deque
+from datetime import datetime
+import numpy as np
+
+# Maximum points sent to the browser per series
+TIMESERIES_POINT_BUDGET = int(os.environ.get("TIMESERIES_POINT_BUDGET", "2000"))
+
+# Predictions in the moving average
+MOVING_AVERAGE_WINDOW = 5
+
+# A bucket emits at most this many points
+_POINTS_PER_BUCKET = 4
+
+
+class MinMaxDownsampler:
+    """Bounded first/min/max/last summary of an append-only series"""
+
+    def __init__(self, budget=TIMESERIES_POINT_BUDGET):
+        self.max_buckets = max(1, budget // _POINTS_PER_BUCKET)
+        self.bucket_width = 1
+        self.count = 0
+        # Each bucket: [size, first, minimum, maximum, last]; points are (index, x, y)
+        self.buckets = []
+
+    def append(self, x, y, index=None):
+        """Add a point; index defaults to its position in the series"""
+        point = (self.count if index is None else index, x, y)
+        self.count += 1
+        bucket = self.buckets[-1] if self.buckets else None
+        if bucket is None or bucket[0] >= self.bucket_width:
+            self.buckets.append([1, point, point, point, point])
+            if len(self.buckets) > self.max_buckets:
+                self._halve()
+            return
+        bucket[0] += 1
+        if y < bucket[2][2]:
+            bucket[2] = point
+        if y > bucket[3][2]:
+            bucket[3] = point
+        bucket[4] = point
+
+    def _halve(self):
+        # Merge neighbouring buckets; the open last bucket may be left unpaired
+        merged = []
+        for i in range(0, len(self.buckets) - 1, 2):
+            left, right = self.buckets[i], self.buckets[i + 1]
+            merged.append([
+                left[0] + right[0], left[1],
+                left[2] if left[2][2] <= right[2][2] else right[2],
+                left[3] if left[3][2] >= right[3][2] else right[3],
+                right[4]
+            ])
+        if len(self.buckets) % 2:
+            merged.append(self.buckets[-1])
+        self.buckets = merged
+        self.bucket_width *= 2
+
+    def state(self, encode=None):
+        """Return the buckets as JSON-serializable values; encode converts x values"""
+        encode = encode or (lambda x: x)
+        return {
+            'max_buckets': self.max_buckets, 'bucket_width': self.bucket_width, 'count': self.count,
+            'buckets': [[bucket[0]] + [[point[0], encode(point[1]), point[2]] for point in bucket[1:]]
+                        for bucket in self.buckets]
+        }
+
+    @classmethod
+    def from_state(cls, state, decode=None):
+        """Rebuild a downsampler from state(); decode restores x values"""
+        decode = decode or (lambda x: x)
+        downsampler = cls()
+        downsampler.max_buckets = int(state['max_buckets'])
+        downsampler.bucket_width = int(state['bucket_width'])
+        downsampler.count = int(state['count'])
+        downsampler.buckets = [[int(bucket[0])] + [(int(index), decode(x), float(y)) for index, x, y in bucket[1:]]
+                               for bucket in state['buckets']]
+        return downsampler
+
+    def points(self):
+        """Return (index, x, y) arrays of the retained points in series order"""
+        retained = {}
+        for bucket in self.buckets:
+            for point in bucket[1:]:
+                retained[point[0]] = point
+        ordered = [retained[index] for index in sorted(retained)]
+        if not ordered:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=object), np.empty(0)
+        index, x, y = zip(*ordered)
+        return np.asarray(index), np.asarray(x), np.asarray(y, dtype=np.float64)
+
+    def __len__(self):
+        return self.count
+
+
+class PredictionTimeline:
+    """Downsampled predictions and their moving average, updated per prediction"""
+
+    def __init__(self, budget=TIMESERIES_POINT_BUDGET, window=MOVING_AVERAGE_WINDOW):
+        self.budget = budget
+        self.window = deque(maxlen=window)
+        self._series = {
+            'prediction': MinMaxDownsampler(budget),
+            'moving_average': MinMaxDownsampler(budget)
+        }
+
+    def append(self, timestamp, prediction):
+        prediction = float(prediction)
+        index = len(self)
+        self._series['prediction'].append(timestamp, prediction)
+        self.window.append(prediction)
+        # Like pandas rolling(window).mean(), the average starts once the window is full
+        if len(self.window) == self.window.maxlen:
+            self._series['moving_average'].append(timestamp, sum(self.window) / len(self.window), index)
+
+    def extend(self, timestamps, predictions):
+        for timestamp, prediction in zip(timestamps, predictions):
+            self.append(timestamp, prediction)
+
+    def state(self):
+        """Return the downsampled series as JSON-serializable values"""
+        return {
+            'budget': self.budget, 'window_size': self.window.maxlen, 'window': list(self.window),
+            'series': {name: series.state(datetime.isoformat) for name, series in self._series.items()}
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        """Rebuild a timeline from state()"""
+        timeline = cls(int(state['budget']), int(state['window_size']))
+        timeline.window.extend(float(value) for value in state['window'])
+        timeline._series = {name: MinMaxDownsampler.from_state(series, datetime.fromisoformat)
+                            for name, series in state['series'].items()}
+        return timeline
+
+    def series(self, name):
+        """Return (prediction number, timestamps, values) of a downsampled series"""
+        return self._series[name].points()
+
+    def __len__(self):
+        return len(self._series['prediction'])
@@ -0,0 +1,116 @@
+import numpy as np
+import pandas as pd
+
+
+class FeaturePipeline:
+    """Compiled form of the fitted encoder and scaler
+
+    Holds the category -> code lookup tables and the scaler's mean/scale as
+    plain NumPy arrays so input rows can be turned into model features without
+    going through scikit-learn's per-call validation. Output matches
+    ``prepare_input_data``: scaled numeric columns followed by the ordinal
+    codes of the categorical columns.
+    """
+
+    def __init__(self, num_cols, cat_cols, mean, scale, category_codes, unknown_value=None):
+        self.num_cols = list(num_cols)
+        self.cat_cols = list(cat_cols)
+        self.mean = None if mean is None else np.asarray(mean, dtype=np.float64)
+        self.scale = None if scale is None else np.asarray(scale, dtype=np.float64)
+        self.category_codes = [dict(codes) for codes in category_codes]
+        self.unknown_value = unknown_value
+        self.columns = self.num_cols + self.cat_cols
+        self.n_features = len(self.columns)
+
+    @classmethod
+    def from_fitted(cls, encoder, scaler, num_cols, cat_cols):
+        """Build a pipeline from a fitted OrdinalEncoder and StandardScaler"""
+        if type(encoder).__name__ != "OrdinalEncoder" or not hasattr(encoder, "categories_"):
+            raise TypeError(f"Cannot compile encoder of type {type(encoder).__name__}")
+        if type(scaler).__name__ != "StandardScaler":
+            raise TypeError(f"Cannot compile scaler of type {type(scaler).__name__}")
+
+        category_codes = [
+            {category: float(code) for code, category in enumerate(categories)}
+            for categories in encoder.categories_
+        ]
+
+        unknown_value = None
+        if getattr(encoder, "handle_unknown", "error") == "use_encoded_value":
+            unknown_value = float(encoder.unknown_value)
+
+        mean = scaler.mean_ if getattr(scaler, "with_mean", True) else None
+        scale = scaler.scale_ if getattr(scaler, "with_std", True) else None
+
+        return cls(num_cols, cat_cols, mean, scale, category_codes, unknown_value)
+
+    def _encode(self, index, label):
+        """Return the ordinal code of one normalized label"""
+        code = self.category_codes[index].get(label)
+        if code is None:
+            if self.unknown_value is None:
+                raise ValueError(
+                    f"Found unknown categories ['{label}'] in column {index} during transform"
+                )
+            code = self.unknown_value
+        return code
+
+    def _allocate(self, n_rows, out):
+        """Return an output buffer for n_rows, validating a caller-provided one"""
+        if out is None:
+            return np.empty((n_rows, self.n_features), dtype=np.float64)
+        if out.shape != (n_rows, self.n_features):
+            raise ValueError(f"Output buffer has shape {out.shape}, expected {(n_rows, self.n_features)}")
+        return out
+
+    def _scale_numeric(self, out):
+        """Standardize the numeric block of out in place"""
+        numeric = out[:, :len(self.num_cols)]
+        if self.mean is not None:
+            numeric -= self.mean
+        if self.scale is not None:
+            numeric /= self.scale
+
+    def transform_record(self, record, out=None):
+        """Transform one order given as a mapping of column -> value
+
+        Returns a (1, n_features) array, written into ``out`` when provided.
+        """
+        out = self._allocate(1, out)
+        row = out[0]
+
+        # Object-array assignment converts like sklearn's input check (None -> NaN)
+        row[:len(self.num_cols)] = np.array([record[col] for col in self.num_cols], dtype=object)
+
+        offset = len(self.num_cols)
+        for j, col in enumerate(self.cat_cols):
+            row[offset + j] = self._encode(j, str(record[col]).lower().strip())
+
+        self._scale_numeric(out)
+        return out
+
+    def transform(self, frame, out=None):
+        """Transform a DataFrame of orders into the model feature matrix
+
+        Returns an (n_rows, n_features) array, written into ``out`` when provided.
+        """
+        n_rows = len(frame)
+        if n_rows == 1:
+            # One object-array conversion is far cheaper than 15 column lookups
+            return self.transform_record(dict(zip(frame.columns, frame.to_numpy(dtype=object)[0])), out)
+
+        out = self._allocate(n_rows, out)
+
+        for j, col in enumerate(self.num_cols):
+            out[:, j] = frame[col].to_numpy()
+
+        # Normalize and look up each distinct label once instead of once per row
+        offset = len(self.num_cols)
+        for j, col in enumerate(self.cat_cols):
+            codes, uniques = pd.factorize(frame[col], use_na_sentinel=False)
+            table = np.array([self._encode(j, str(label).lower().strip()) for label in uniques],
+                             dtype=np.float64)
+            out[:, offset + j] = table[codes]
+
+        self._scale_numeric(out)
+        return out
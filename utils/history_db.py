@@ -0,0 +1,377 @@
+"""Persistent prediction history in SQLite
+
+Predictions are buffered in memory and written in batches (one transaction
+per HISTORY_BATCH_SIZE rows or HISTORY_FLUSH_SECONDS, whichever comes
+first). Every query flushes the buffer first, so readers always see their own
+writes. The History tab pages through the table and the dashboard aggregates
+in SQL, so nothing is loaded wholesale into the session. Unfiltered key
+metrics come from ``stats``, the distribution tab from ``distribution`` (a
+quantile sketch and histogram), time-series charts from ``timeline`` (a
+min/max-downsampled series) and the correlation heatmap from ``correlations``
+(online co-moment matrices).
+
+The summaries reflect the stored rows up to the highest id folded in so far.
+Several processes (Streamlit workers, the API server) may write to the same
+database, so ``refresh()`` checks ``MAX(id)`` and replays only rows written
+since, by any process, in id order; call it before reading the summaries.
+Every HISTORY_SNAPSHOT_ROWS replayed rows the summaries' numeric state is
+saved as JSON to the ``summary_snapshot`` table, so a new process restores them and replays only
+the newer rows instead of scanning the whole table::
+
+    db = get_history_db()
+    db.add(datetime.now(), 31.2, (27.5, 34.9), input_frame)
+    db.page(offset=0, limit=50, filters={'City': 'Urban'})
+    db.summary(filters={'City': 'Urban'})
+    db.refresh()
+    db.stats.statistics()
+"""
+import atexit
+import json
+import os
+import sqlite3
+import threading
+import time
+import numpy as np
+import pandas as pd
+from utils.data_handler import NUM_COLS, CAT_COLS
+from utils.history_store import PredictionHistory, FULL_ENSEMBLE
+from utils.running_stats import RunningStats, OnlineCovariance, TREND_WINDOW
+from utils.quantile_sketch import (
+    DistributionSummary, DEFAULT_K, HISTOGRAM_LOW, HISTOGRAM_HIGH, HISTOGRAM_BIN_WIDTH
+)
+from utils.downsampling import PredictionTimeline, TIMESERIES_POINT_BUDGET, MOVING_AVERAGE_WINDOW
+from utils.metrics import HISTORY_LOAD_SECONDS
+
+HISTORY_DB_PATH = os.environ.get("HISTORY_DB", "prediction_history.db")
+HISTORY_BATCH_SIZE = int(os.environ.get("HISTORY_BATCH_SIZE", "100"))
+HISTORY_FLUSH_SECONDS = float(os.environ.get("HISTORY_FLUSH_SECONDS", "5"))
+
+# Rows replayed between saves of the summary snapshot
+HISTORY_SNAPSHOT_ROWS = int(os.environ.get("HISTORY_SNAPSHOT_ROWS", "10000"))
+
+# Half-life, in predictions, of the recency-weighted correlation matrix
+CORRELATION_HALF_LIFE = float(os.environ.get("CORRELATION_HALF_LIFE", "500"))
+
+# Variables in the online correlation matrix
+CORRELATION_COLUMNS = [
+    "prediction", "distance_km", "prep_time_min", "Delivery_person_Age", "Delivery_person_Ratings",
+    "Vehicle_condition", "multiple_deliveries", "order_hour", "is_weekend"
+]
+
+# Columns the History tab can filter on; each has an index
+FILTER_COLUMNS = ["City", "Weatherconditions", "Road_traffic_density"]
+
+COLUMNS = ["timestamp", "prediction", "lower", "upper", "n_trees"] + NUM_COLS + CAT_COLS
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S.%f"
+
+# Summary layout a stored snapshot must match to be restored
+_SNAPSHOT_SETTINGS = json.dumps([
+    DEFAULT_K, HISTOGRAM_LOW, HISTOGRAM_HIGH, HISTOGRAM_BIN_WIDTH, TIMESERIES_POINT_BUDGET,
+    MOVING_AVERAGE_WINDOW, TREND_WINDOW, CORRELATION_HALF_LIFE, CORRELATION_COLUMNS
+])
+
+_SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS predictions ("
+    "id INTEGER PRIMARY KEY, timestamp TEXT NOT NULL, prediction REAL NOT NULL, "
+    "lower REAL, upper REAL, n_trees INTEGER, "
+    + ", ".join(f"{col} REAL" for col in NUM_COLS) + ", "
+    + ", ".join(f"{col} TEXT" for col in CAT_COLS) + ")",
+    "CREATE INDEX IF NOT EXISTS idx_predictions_timestamp ON predictions (timestamp)"
+] + [
+    f"CREATE INDEX IF NOT EXISTS idx_predictions_{col.lower()} ON predictions ({col}, timestamp)"
+    for col in FILTER_COLUMNS
+] + [
+    # Bumped by clear() so every process knows to rebuild its summaries
+    "CREATE TABLE IF NOT EXISTS history_meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)",
+    # Summary state (plain numbers, as JSON) covering the rows up to last_id
+    "CREATE TABLE IF NOT EXISTS summary_snapshot (name TEXT PRIMARY KEY, generation INTEGER NOT NULL, "
+    "last_id INTEGER NOT NULL, settings TEXT NOT NULL, state TEXT NOT NULL)"
+]
+
+
+def _where(filters, since=None):
+    """Build a WHERE clause and its parameters from column filters"""
+    clauses, params = [], []
+    for col, value in (filters or {}).items():
+        if col not in FILTER_COLUMNS:
+            raise ValueError(f"Cannot filter history on {col}")
+        if value is not None:
+            clauses.append(f"{col} = ?")
+            params.append(value)
+    if since is not None:
+        clauses.append("timestamp >= ?")
+        params.append(since.strftime(TIMESTAMP_FORMAT))
+    return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+
+class HistoryDatabase:
+    """SQLite prediction history with batched writes"""
+
+    def __init__(self, path=HISTORY_DB_PATH, batch_size=HISTORY_BATCH_SIZE,
+                 flush_seconds=HISTORY_FLUSH_SECONDS):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self._pending = []
+        self._oldest_pending = None
+        self._lock = threading.RLock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Streamlit reruns on different threads; access is serialized by the lock
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._conn:
+            for statement in _SCHEMA:
+                self._conn.execute(statement)
+        # Summaries are seeded once (from the snapshot when there is one), then extended by refresh()
+        start = time.perf_counter()
+        self._reset_summaries()
+        self._generation = self._read_generation()
+        source = "snapshot" if self._restore_snapshot() else "scan"
+        self.refresh()
+        HISTORY_LOAD_SECONDS.observe(time.perf_counter() - start, source=source)
+        atexit.register(self.flush)
+
+    def _new_correlations(self):
+        # All-time and recency-weighted co-moments of the same variables
+        return {
+            'all': OnlineCovariance(CORRELATION_COLUMNS),
+            'recent': OnlineCovariance(CORRELATION_COLUMNS, half_life=CORRELATION_HALF_LIFE)
+        }
+
+    def _reset_summaries(self):
+        self.stats = RunningStats()
+        self.distribution = DistributionSummary()
+        self.timeline = PredictionTimeline()
+        self.correlations = self._new_correlations()
+        # Highest row id folded into the summaries, and covered by the saved snapshot
+        self._last_id = 0
+        self._snapshot_id = 0
+
+    def _read_generation(self):
+        row = self._conn.execute("SELECT value FROM history_meta WHERE key = 'generation'").fetchone()
+        return row[0] if row else 0
+
+    def refresh(self):
+        """Fold rows stored since the last refresh, by this or any other process, into the summaries"""
+        with self._lock:
+            self.flush()
+            generation = self._read_generation()
+            max_id = self._conn.execute("SELECT MAX(id) FROM predictions").fetchone()[0] or 0
+            # Another process cleared the history: start over from what is stored now
+            if generation != self._generation or max_id < self._last_id:
+                self._reset_summaries()
+                self._generation = generation
+            if max_id > self._last_id:
+                self._replay(max_id)
+                if self._last_id - self._snapshot_id >= HISTORY_SNAPSHOT_ROWS:
+                    self._save_snapshot()
+
+    def _restore_snapshot(self):
+        row = self._conn.execute(
+            "SELECT last_id, state FROM summary_snapshot WHERE name = 'summaries' "
+            "AND generation = ? AND settings = ?",
+            (self._generation, _SNAPSHOT_SETTINGS)
+        ).fetchone()
+        if row is None:
+            return False
+        try:
+            state = json.loads(row[1])
+            self.stats = RunningStats.from_state(state['stats'])
+            self.distribution = DistributionSummary.from_state(state['distribution'])
+            self.timeline = PredictionTimeline.from_state(state['timeline'])
+            self.correlations = {name: OnlineCovariance.from_state(covariance)
+                                 for name, covariance in state['correlations'].items()}
+        except (ValueError, TypeError, KeyError, AttributeError):
+            # Unreadable snapshot (e.g. an older layout); rebuild from the table
+            self._reset_summaries()
+            return False
+        self._last_id = self._snapshot_id = row[0]
+        return True
+
+    def _save_snapshot(self):
+        state = json.dumps({
+            'stats': self.stats.state(),
+            'distribution': self.distribution.state(),
+            'timeline': self.timeline.state(),
+            'correlations': {name: covariance.state() for name, covariance in self.correlations.items()}
+        })
+        # Keep whichever snapshot is newest when several processes save
+        with self._conn:
+            self._conn.execute(
+                "INSERT INTO summary_snapshot (name, generation, last_id, settings, state) "
+                "VALUES ('summaries', ?, ?, ?, ?) ON CONFLICT (name) DO UPDATE SET "
+                "generation = excluded.generation, last_id = excluded.last_id, "
+                "settings = excluded.settings, state = excluded.state "
+                "WHERE excluded.generation > summary_snapshot.generation "
+                "OR (excluded.generation = summary_snapshot.generation AND excluded.last_id > summary_snapshot.last_id)",
+                (self._generation, self._last_id, _SNAPSHOT_SETTINGS, state)
+            )
+        self._snapshot_id = self._last_id
+
+    def _replay(self, max_id, chunksize=100000):
+        # One scan in id (insertion) order feeds every summary
+        cursor = self._conn.execute(
+            f"SELECT id, timestamp, {', '.join(CORRELATION_COLUMNS)} FROM predictions "
+            "WHERE id > ? AND id <= ? ORDER BY id",
+            (self._last_id, max_id)
+        )
+        while True:
+            rows = cursor.fetchmany(chunksize)
+            if not rows:
+                return
+            timestamps = pd.to_datetime([row[1] for row in rows], format=TIMESTAMP_FORMAT).to_pydatetime()
+            values = np.array([row[2:] for row in rows], dtype=np.float64)
+            predictions = values[:, CORRELATION_COLUMNS.index("prediction")]
+            # Stats of the block, merged with the earlier rows counted as older
+            self.stats = RunningStats.from_aggregates(
+                len(predictions), predictions.mean(), predictions.var(),
+                predictions.min(), predictions.max(), min(timestamps), max(timestamps),
+                predictions[-TREND_WINDOW:]
+            ).merge(self.stats)
+            self.distribution.update_many(predictions)
+            self.timeline.extend(timestamps, predictions)
+            for covariance in self.correlations.values():
+                covariance.update_many(values)
+            self._last_id = rows[-1][0]
+
+    def add(self, timestamp, prediction, confidence, input_data, n_trees=None):
+        """Queue one prediction; written with the next batch, summarized by the next refresh"""
+        if isinstance(input_data, pd.DataFrame):
+            input_data = input_data.iloc[0].to_dict()
+        row = (
+            [timestamp.strftime(TIMESTAMP_FORMAT), float(prediction), float(confidence[0]),
+             float(confidence[1]), FULL_ENSEMBLE if n_trees is None else int(n_trees)]
+            + [float(input_data[col]) for col in NUM_COLS]
+            + [str(input_data[col]) for col in CAT_COLS]
+        )
+        with self._lock:
+            if not self._pending:
+                self._oldest_pending = time.monotonic()
+            self._pending.append(row)
+            if (len(self._pending) >= self.batch_size
+                    or time.monotonic() - self._oldest_pending >= self.flush_seconds):
+                self.flush()
+
+    def flush(self):
+        """Write queued predictions in one transaction"""
+        with self._lock:
+            if not self._pending:
+                return
+            placeholders = ", ".join("?" for _ in COLUMNS)
+            with self._conn:
+                self._conn.executemany(
+                    f"INSERT INTO predictions ({', '.join(COLUMNS)}) VALUES ({placeholders})",
+                    self._pending
+                )
+            self._pending = []
+            self._oldest_pending = None
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            self.flush()
+            return pd.read_sql_query(sql, self._conn, params=params)
+
+    def count(self, filters=None):
+        where, params = _where(filters)
+        return int(self._query(f"SELECT COUNT(*) AS n FROM predictions{where}", params)['n'].iloc[0])
+
+    def page(self, offset=0, limit=50, filters=None):
+        """Return one page of predictions, newest first"""
+        where, params = _where(filters)
+        return self._query(
+            f"SELECT {', '.join(COLUMNS)} FROM predictions{where} "
+            "ORDER BY timestamp DESC, id DESC LIMIT ? OFFSET ?",
+            params + [int(limit), int(offset)]
+        )
+
+    def distinct(self, column):
+        """Return the values seen in a filter column"""
+        if column not in FILTER_COLUMNS:
+            raise ValueError(f"Cannot filter history on {column}")
+        return self._query(f"SELECT DISTINCT {column} FROM predictions ORDER BY {column}")[column].tolist()
+
+    def summary(self, filters=None, since=None):
+        """Aggregate predictions in SQL: total_predictions, average_time, std_deviation, min_time, max_time"""
+        where, params = _where(filters, since)
+        # Variance around the mean from a subquery, avoiding E[x^2] - E[x]^2 cancellation
+        row = self._query(
+            "SELECT COUNT(*) AS n, AVG(prediction) AS mean, MIN(prediction) AS min, MAX(prediction) AS max, "
+            f"AVG((prediction - m.mean) * (prediction - m.mean)) AS variance FROM predictions, "
+            f"(SELECT AVG(prediction) AS mean FROM predictions{where}) AS m{where}",
+            params + params
+        ).iloc[0]
+        if not row['n']:
+            return {}
+        return {
+            'total_predictions': int(row['n']),
+            'average_time': row['mean'],
+            'std_deviation': row['variance'] ** 0.5,
+            'min_time': row['min'],
+            'max_time': row['max']
+        }
+
+    def group_average(self, column, filters=None, since=None):
+        """Return count and mean prediction per value of a filter column"""
+        if column not in FILTER_COLUMNS:
+            raise ValueError(f"Cannot group history on {column}")
+        where, params = _where(filters, since)
+        return self._query(
+            f"SELECT {column}, COUNT(*) AS count, AVG(prediction) AS avg_time "
+            f"FROM predictions{where} GROUP BY {column} ORDER BY {column}",
+            params
+        )
+
+    def recent(self, limit, filters=None):
+        """Load the newest predictions, oldest first, as a PredictionHistory"""
+        frame = self.page(0, limit, filters).iloc[::-1]
+        history = PredictionHistory(capacity=max(1, len(frame)))
+        history.extend(frame)
+        return history
+
+    def iter_csv(self, filters=None, chunksize=10000):
+        """Yield the matching predictions as CSV text, chunk by chunk"""
+        where, params = _where(filters)
+        with self._lock:
+            self.flush()
+            chunks = pd.read_sql_query(
+                f"SELECT {', '.join(COLUMNS)} FROM predictions{where} ORDER BY timestamp, id",
+                self._conn, params=params, chunksize=chunksize
+            )
+            for i, chunk in enumerate(chunks):
+                yield chunk.to_csv(index=False, header=(i == 0))
+
+    def clear(self):
+        with self._lock:
+            self._pending = []
+            self._oldest_pending = None
+            with self._conn:
+                self._conn.execute("DELETE FROM predictions")
+                self._conn.execute("DELETE FROM summary_snapshot")
+                self._conn.execute(
+                    "INSERT INTO history_meta (key, value) VALUES ('generation', 1) "
+                    "ON CONFLICT (key) DO UPDATE SET value = value + 1"
+                )
+            self._reset_summaries()
+            self._generation = self._read_generation()
+
+    def close(self):
+        with self._lock:
+            self.flush()
+            self._conn.close()
+
+
+_default_db = None
+_default_db_lock = threading.Lock()
+
+def get_history_db():
+    """Return the process-wide history database at HISTORY_DB"""
+    global _default_db
+    with _default_db_lock:
+        if _default_db is None:
+            _default_db = HistoryDatabase()
+        return _default_db
@@ -0,0 +1,128 @@
+"""Columnar, append-only store for the session's prediction history
+
+Each feature lives in its own growable NumPy array (categoricals as small
+integer codes), next to the prediction, interval bounds, timestamp and tree
+budget. Appends are amortized O(1) and analytics read whole columns::
+
+    history = PredictionHistory()
+    history.append(datetime.now(), 31.2, (27.5, 34.9), input_frame)
+    history.column('distance_km')      # float64 view of every record
+    history.column('Weatherconditions')  # decoded labels
+"""
+import numpy as np
+import pandas as pd
+from utils.data_handler import NUM_COLS, CAT_COLS
+
+INITIAL_CAPACITY = 64
+
+# Stored in place of n_trees when the full ensemble was used
+FULL_ENSEMBLE = -1
+
+
+class PredictionHistory:
+    """Growable per-column arrays of past predictions"""
+
+    def __init__(self, capacity=INITIAL_CAPACITY):
+        self._size = 0
+        self._capacity = max(1, int(capacity))
+        self._columns = {
+            'timestamp': np.empty(self._capacity, dtype='datetime64[us]'),
+            'prediction': np.empty(self._capacity, dtype=np.float64),
+            'lower': np.empty(self._capacity, dtype=np.float64),
+            'upper': np.empty(self._capacity, dtype=np.float64),
+            'n_trees': np.empty(self._capacity, dtype=np.int32)
+        }
+        for col in NUM_COLS:
+            self._columns[col] = np.empty(self._capacity, dtype=np.float64)
+        for col in CAT_COLS:
+            self._columns[col] = np.empty(self._capacity, dtype=np.int16)
+        # Categorical labels in first-seen order; codes index into these lists
+        self._categories = {col: [] for col in CAT_COLS}
+        self._codes = {col: {} for col in CAT_COLS}
+
+    def __len__(self):
+        return self._size
+
+    def __bool__(self):
+        return self._size > 0
+
+    def _grow(self):
+        self._capacity *= 2
+        for name, values in self._columns.items():
+            grown = np.empty(self._capacity, dtype=values.dtype)
+            grown[:self._size] = values[:self._size]
+            self._columns[name] = grown
+
+    def _encode(self, col, label):
+        code = self._codes[col].get(label)
+        if code is None:
+            code = self._codes[col][label] = len(self._categories[col])
+            self._categories[col].append(label)
+        return code
+
+    def append(self, timestamp, prediction, confidence, input_data, n_trees=None):
+        """Add one prediction; input_data is the one-row input frame (or a dict)"""
+        if self._size == self._capacity:
+            self._grow()
+        if isinstance(input_data, pd.DataFrame):
+            input_data = input_data.iloc[0].to_dict()
+
+        i = self._size
+        columns = self._columns
+        columns['timestamp'][i] = np.datetime64(timestamp, 'us')
+        columns['prediction'][i] = prediction
+        columns['lower'][i] = confidence[0]
+        columns['upper'][i] = confidence[1]
+        columns['n_trees'][i] = FULL_ENSEMBLE if n_trees is None else n_trees
+        for col in NUM_COLS:
+            columns[col][i] = float(input_data[col])
+        for col in CAT_COLS:
+            columns[col][i] = self._encode(col, str(input_data[col]))
+        self._size += 1
+
+    def extend(self, frame):
+        """Append every row of a frame holding the history columns (e.g. from a query)"""
+        n = len(frame)
+        while self._size + n > self._capacity:
+            self._grow()
+
+        start, stop = self._size, self._size + n
+        columns = self._columns
+        columns['timestamp'][start:stop] = pd.to_datetime(frame['timestamp']).to_numpy(dtype='datetime64[us]')
+        for name in ['prediction', 'lower', 'upper', 'n_trees'] + NUM_COLS:
+            columns[name][start:stop] = frame[name].to_numpy()
+        for col in CAT_COLS:
+            # Encode each distinct label once, then map the whole column
+            labels, inverse = np.unique(frame[col].astype(str).to_numpy(), return_inverse=True)
+            codes = np.array([self._encode(col, label) for label in labels], dtype=np.int16)
+            columns[col][start:stop] = codes[inverse]
+        self._size = stop
+
+    def clear(self):
+        self.__init__()
+
+    def column(self, name):
+        """Return a read-only view of one column; categoricals are decoded to labels"""
+        if name in self._categories:
+            return np.asarray(self._categories[name], dtype=object)[self.codes(name)]
+        values = self._columns[name][:self._size]
+        values.flags.writeable = False
+        return values
+
+    def codes(self, name):
+        """Return the integer codes of a categorical column"""
+        values = self._columns[name][:self._size]
+        values.flags.writeable = False
+        return values
+
+    def categories(self, name):
+        return list(self._categories[name])
+
+    def to_frame(self, columns=None):
+        """Return the history (or the given columns) as a DataFrame"""
+        names = columns or list(self._columns)
+        return pd.DataFrame({name: self.column(name) for name in names})
+
+    def nbytes(self):
+        """Bytes held by the column buffers (including spare capacity)"""
+        return sum(values.nbytes for values in self._columns.values())
@@ -0,0 +1,354 @@
+"""In-process metrics with Prometheus text exposition
+
+Counters and histograms live in a process-wide registry. When METRICS_DIR is
+set, every process (e.g. each Streamlit worker) periodically writes its
+values to ``METRICS_DIR/metrics_<pid>_<nonce>.json`` and rendering sums the
+files of all live processes, so any one of them can serve the scrape
+endpoint. A process removes its file at exit; files left by processes that
+died without cleaning up are skipped and deleted when a scrape finds them::
+
+    METRICS_DIR=/tmp/delivery-metrics METRICS_PORT=9464 streamlit run main.py
+    curl localhost:9464/metrics
+"""
+import atexit
+import bisect
+import glob
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Latency buckets in seconds, from sub-millisecond to long batch jobs
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Seconds between snapshot writes in multi-process mode
+FLUSH_INTERVAL = float(os.environ.get("METRICS_FLUSH_SECONDS", "5"))
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Joins label values into the string keys used in snapshots
+KEY_SEPARATOR = "\x1f"
+
+
+def _label_key(labelnames, labels):
+    if set(labels) != set(labelnames):
+        raise ValueError(f"Expected labels {list(labelnames)}, got {sorted(labels)}")
+    return tuple(str(labels[name]) for name in labelnames)
+
+
+def _format_labels(labelnames, key, extra=None):
+    pairs = list(zip(labelnames, key)) + (extra or [])
+    if not pairs:
+        return ""
+    escaped = [
+        (name, value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"'))
+        for name, value in pairs
+    ]
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonically increasing count, optionally split by labels"""
+
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(_label_key(self.labelnames, labels), 0)
+
+    def snapshot(self):
+        with self._lock:
+            return {KEY_SEPARATOR.join(key): value for key, value in self._values.items()}
+
+    @staticmethod
+    def merge(total, values):
+        for key, value in values.items():
+            total[key] = total.get(key, 0) + value
+        return total
+
+    def render(self, values):
+        lines = []
+        for joined, value in sorted(values.items()):
+            key = tuple(joined.split(KEY_SEPARATOR)) if self.labelnames else ()
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    """Distribution of observed values over fixed cumulative buckets"""
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [per-bucket counts (last is +Inf), sum, count]
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = _label_key(self.labelnames, labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of a block in seconds"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels):
+        entry = self._values.get(_label_key(self.labelnames, labels))
+        return entry[2] if entry else 0
+
+    def snapshot(self):
+        with self._lock:
+            return {KEY_SEPARATOR.join(key): [list(counts), total, count]
+                    for key, (counts, total, count) in self._values.items()}
+
+    @staticmethod
+    def merge(total, values):
+        for key, (counts, value_sum, count) in values.items():
+            entry = total.setdefault(key, [[0] * len(counts), 0.0, 0])
+            entry[0] = [a + b for a, b in zip(entry[0], counts)]
+            entry[1] += value_sum
+            entry[2] += count
+        return total
+
+    def render(self, values):
+        lines = []
+        bounds = list(self.buckets) + [float("inf")]
+        for joined, (counts, value_sum, count) in sorted(values.items()):
+            key = tuple(joined.split(KEY_SEPARATOR)) if self.labelnames else ()
+            cumulative = 0
+            for bound, bucket_count in zip(bounds, counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labelnames, key, [("le", _format_value(float(bound)))])
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(float(value_sum))}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+def _pid_alive(pid):
+    if os.name == "nt":
+        # os.kill would terminate the process on Windows; assume it is alive
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _is_stale(path):
+    """Whether a snapshot file belongs to a process that is gone"""
+    parts = os.path.basename(path)[len("metrics_"):-len(".json")].split("_")
+    try:
+        pid = int(parts[0])
+    except ValueError:
+        return False
+    # Another nonce for our own pid means an earlier process that had the same pid
+    if pid == os.getpid():
+        return True
+    return len(parts) != 2 or not _pid_alive(pid)
+
+
+class MetricsRegistry:
+    """Named metrics of one process, optionally shared through a directory"""
+
+    def __init__(self, directory=None):
+        self.directory = directory
+        # Distinguishes this process's file from one left by an earlier process with the same pid
+        self._nonce = uuid.uuid4().hex[:8]
+        self._metrics = {}
+        self._lock = threading.Lock()
+        self._flusher = None
+
+    def _register(self, metric_class, name, documentation, labelnames, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = metric_class(name, documentation, labelnames, **kwargs)
+            elif not isinstance(metric, metric_class):
+                raise ValueError(f"Metric {name} is already registered as a {metric.kind}")
+        self._start_flusher()
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter, name, documentation, labelnames)
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def snapshot(self):
+        """Return this process's values keyed by metric name"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {metric.name: metric.snapshot() for metric in metrics}
+
+    def flush(self):
+        """Write this process's snapshot to the shared directory (atomically)"""
+        if not self.directory:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path()
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(self.snapshot(), f)
+        os.replace(temp_path, path)
+
+    def _path(self):
+        return os.path.join(self.directory, f"metrics_{os.getpid()}_{self._nonce}.json")
+
+    def remove(self):
+        """Delete this process's snapshot file, so exited processes drop out of the totals"""
+        if not self.directory:
+            return
+        try:
+            os.remove(self._path())
+        except OSError:
+            pass
+
+    def _start_flusher(self):
+        if not self.directory or self._flusher is not None:
+            return
+        with self._lock:
+            if self._flusher is not None:
+                return
+
+            def flush_forever():
+                while True:
+                    time.sleep(FLUSH_INTERVAL)
+                    try:
+                        self.flush()
+                    except OSError:
+                        pass
+
+            self._flusher = threading.Thread(target=flush_forever, name="metrics-flusher", daemon=True)
+            self._flusher.start()
+            atexit.register(self.remove)
+
+    def collect(self):
+        """Return values summed over every process sharing the directory"""
+        if not self.directory:
+            return self.snapshot()
+
+        # Refresh our own file so the scrape includes this process's latest values
+        self.flush()
+        own_path = self._path()
+        totals = {}
+        for path in glob.glob(os.path.join(self.directory, "metrics_*.json")):
+            if path != own_path and _is_stale(path):
+                # Left by a process that died without removing it
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+                continue
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    snapshot = json.load(f)
+            except (OSError, ValueError):
+                continue
+            for name, values in snapshot.items():
+                metric = self._metrics.get(name)
+                if metric is not None:
+                    totals[name] = metric.merge(totals.get(name, {}), values)
+        return totals
+
+    def render(self):
+        """Return all metrics in the Prometheus text exposition format"""
+        values = self.collect()
+        lines = []
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda metric: metric.name)
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render(values.get(metric.name, {})))
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry(os.environ.get("METRICS_DIR") or None)
+
+PREDICTIONS = REGISTRY.counter(
+    "delivery_predictions_total", "Orders scored, by entry point", ["kind"])
+BATCH_ROWS = REGISTRY.counter(
+    "delivery_batch_rows_total", "Batch rows processed, by outcome", ["outcome"])
+CACHE_LOOKUPS = REGISTRY.counter(
+    "delivery_prediction_cache_lookups_total", "Prediction cache lookups, by result", ["result"])
+STAGE_LATENCY = REGISTRY.histogram(
+    "delivery_stage_latency_seconds", "Latency of each prediction stage", ["stage"])
+BATCH_LATENCY = REGISTRY.histogram(
+    "delivery_batch_latency_seconds", "Wall time of batch jobs, by mode", ["mode"])
+MODEL_LOAD_SECONDS = REGISTRY.histogram(
+    "delivery_model_load_seconds", "Time to load the encoder, scaler and model")
+HISTORY_LOAD_SECONDS = REGISTRY.histogram(
+    "delivery_history_load_seconds", "Time to seed the history summaries, by starting point", ["source"])
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = REGISTRY.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port, host="127.0.0.1"):
+    """Serve /metrics on a daemon thread; returns the server or None if the port is taken
+
+    With several workers sharing METRICS_DIR, whichever binds the port first
+    serves the totals of all of them.
+    """
+    try:
+        server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    except OSError:
+        return None
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    return server
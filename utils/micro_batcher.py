@@ -0,0 +1,121 @@
+import asyncio
+import threading
+import time
+
+
+class MicroBatcher:
+    """Coalesce concurrent single-item requests into batched scoring calls
+
+    Requests wait at most ``max_wait_ms`` for others to arrive, and a batch is
+    dispatched as soon as it holds ``max_batch_size`` items. ``score_batch``
+    receives a list of items and must return one result per item, in order.
+    Larger waits and batches trade latency for throughput.
+    """
+
+    def __init__(self, score_batch, max_batch_size=64, max_wait_ms=2.0):
+        self.score_batch = score_batch
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self.batches = 0
+        self.items = 0
+        self._queue = None
+        self._worker = None
+        self._loop = None
+        self._thread = None
+
+    async def start(self):
+        """Start the batching worker on the running event loop"""
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        self._worker = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the worker; requests still queued are failed"""
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        while self._queue is not None and not self._queue.empty():
+            _, future = self._queue.get_nowait()
+            if not future.done():
+                future.set_exception(RuntimeError("Micro-batcher stopped"))
+
+    async def submit(self, item):
+        """Queue one item and wait for its result"""
+        future = self._loop.create_future()
+        await self._queue.put((item, future))
+        return await future
+
+    async def _collect(self):
+        """Wait for the first item, then gather more until the batch is full or the wait expires"""
+        batch = [await self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            # Drain what is already queued without waiting
+            while len(batch) < self.max_batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            remaining = deadline - time.monotonic()
+            if len(batch) >= self.max_batch_size or remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+            items = [item for item, _ in batch]
+            try:
+                # Score off the event loop so new requests keep queueing meanwhile
+                results = await self._loop.run_in_executor(None, self.score_batch, items)
+                if len(results) != len(items):
+                    raise RuntimeError(f"score_batch returned {len(results)} results for {len(items)} items")
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.items += len(items)
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+    def start_in_thread(self):
+        """Run the batcher on its own event loop in a daemon thread
+
+        Use ``submit_threadsafe`` to call it from synchronous code such as
+        threaded HTTP handlers.
+        """
+        ready = threading.Event()
+
+        def run_loop():
+            loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(loop)
+            loop.run_until_complete(self.start())
+            ready.set()
+            loop.run_forever()
+
+        self._thread = threading.Thread(target=run_loop, name="micro-batcher", daemon=True)
+        self._thread.start()
+        ready.wait()
+
+    def submit_threadsafe(self, item, timeout=None):
+        """Queue one item from another thread and block until its result is ready"""
+        future = asyncio.run_coroutine_threadsafe(self.submit(item), self._loop)
+        return future.result(timeout)
+
+    def stats(self):
+        return {
+            'batches': self.batches,
+            'items': self.items,
+            'average_batch_size': self.items / self.batches if self.batches else 0.0,
+            'max_batch_size': self.max_batch_size,
+            'max_wait_ms': self.max_wait * 1000.0
+        }
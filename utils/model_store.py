@@ -0,0 +1,215 @@
+"""Memory-mappable storage for compiled forests
+
+A compiled forest is saved as a directory holding one uncompressed ``.npy``
+file per node table plus a small ``forest.json`` manifest. Loading maps the
+files instead of reading them, so start-up is near-instant, pages are faulted
+in only when trees are evaluated, and every process on the host shares the
+same physical pages through the OS page cache.
+
+Convert a pickled forest (optionally compacted to float32 values and minimal
+index types) and compare cold starts with::
+
+    python -m utils.model_store convert rf_model.pkl rf_model.forest
+    python -m utils.model_store convert --compact rf_model.pkl rf_model.forest
+    python -m utils.model_store report rf_model.pkl rf_model.forest
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from utils.compact_forest import CompactForest, compile_forest, sklearn_forest_nbytes
+
+FORMAT_VERSION = 1
+MANIFEST_NAME = "forest.json"
+ARRAY_NAMES = ["feature", "threshold", "children", "value", "roots", "missing_go_left"]
+
+# Width of the model input: 9 scaled numeric + 6 encoded categorical columns
+N_FEATURES = 15
+
+
+def save_forest(forest, path):
+    """Write a CompactForest to a directory of memory-mappable .npy files"""
+    os.makedirs(path, exist_ok=True)
+
+    arrays = {}
+    for name in ARRAY_NAMES:
+        array = getattr(forest, name)
+        if array is None:
+            continue
+        np.save(os.path.join(path, f"{name}.npy"), np.ascontiguousarray(array))
+        arrays[name] = {"dtype": str(array.dtype), "shape": list(array.shape)}
+
+    manifest = {
+        "format_version": FORMAT_VERSION,
+        "n_features": forest.n_features,
+        "n_estimators": forest.n_estimators,
+        "n_nodes": forest.n_nodes,
+        "version": forest.version,
+        "arrays": arrays
+    }
+    # Write the manifest last so a partially written directory is never loadable
+    with open(os.path.join(path, MANIFEST_NAME), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+
+
+def load_forest(path, mmap=True):
+    """Load a CompactForest saved by save_forest, memory-mapped by default"""
+    with open(os.path.join(path, MANIFEST_NAME), "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+
+    if manifest.get("format_version") != FORMAT_VERSION:
+        raise ValueError(f"Unsupported forest format version: {manifest.get('format_version')}")
+
+    mmap_mode = "r" if mmap else None
+    arrays = {
+        name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mmap_mode)
+        for name in manifest["arrays"]
+    }
+
+    return CompactForest(
+        arrays["feature"], arrays["threshold"], arrays["children"], arrays["value"],
+        arrays["roots"], manifest["n_features"], arrays.get("missing_go_left"),
+        version=manifest.get("version")
+    )
+
+
+def is_forest_dir(path):
+    """Return True if path holds a saved forest"""
+    return os.path.isfile(os.path.join(path, MANIFEST_NAME))
+
+
+def _sample_inputs(n_rows, seed=0):
+    """Model-space rows for comparing forests: scaled numerics, small integer codes"""
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(n_rows, N_FEATURES))
+    # The last six columns hold ordinal category codes
+    X[:, 9:] = rng.integers(0, 8, size=(n_rows, N_FEATURES - 9))
+    return X
+
+
+def compaction_report(model, forest, compacted, n_rows=10000):
+    """Compare memory and predictions of a pickled forest and its compacted form"""
+    X = _sample_inputs(n_rows)
+    reference = forest.predict(X)
+    delta = np.abs(compacted.predict(X) - reference)
+    return {
+        "sklearn_mb": sklearn_forest_nbytes(model) / (1024 * 1024),
+        "compiled_mb": forest.nbytes / (1024 * 1024),
+        "compact_mb": compacted.nbytes / (1024 * 1024),
+        "rows": n_rows,
+        "max_abs_delta": float(delta.max()),
+        "max_rel_delta": float((delta / np.maximum(np.abs(reference), 1e-12)).max())
+    }
+
+
+def _current_rss_mb():
+    """Resident set size of this process in MB (Linux), or None if unavailable"""
+    try:
+        with open("/proc/self/status", "r", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def _measure_cold_start(path, n_features, n_rows):
+    """Load a model artifact and run one prediction, returning timings and RSS"""
+    import joblib
+
+    baseline_rss = _current_rss_mb()
+    start = time.perf_counter()
+    if is_forest_dir(path):
+        model = load_forest(path)
+    else:
+        model = compile_forest(joblib.load(path))
+    load_seconds = time.perf_counter() - start
+    load_rss = _current_rss_mb()
+
+    X = np.random.default_rng(0).normal(size=(n_rows, n_features))
+    start = time.perf_counter()
+    model.predict(X)
+    predict_seconds = time.perf_counter() - start
+
+    return {
+        "artifact": path,
+        "load_seconds": load_seconds,
+        "first_predict_seconds": predict_seconds,
+        "rss_baseline_mb": baseline_rss,
+        "rss_after_load_mb": load_rss,
+        "rss_after_predict_mb": _current_rss_mb()
+    }
+
+
+def report(paths, n_rows=1):
+    """Measure cold start of each artifact in a fresh interpreter"""
+    results = []
+    for path in paths:
+        path = os.path.abspath(path)
+        code = (
+            "import json, sys\n"
+            "from utils.model_store import _measure_cold_start\n"
+            f"print(json.dumps(_measure_cold_start({path!r}, {N_FEATURES}, {n_rows})))\n"
+        )
+        output = subprocess.run(
+            [sys.executable, "-c", code], check=True, capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        result["artifact"] = os.path.basename(result["artifact"])
+        results.append(result)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert and inspect forest model artifacts")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    convert_parser = subparsers.add_parser("convert", help="Convert a pickled forest to a memory-mappable directory")
+    convert_parser.add_argument("source", help="Pickled model, e.g. rf_model.pkl")
+    convert_parser.add_argument("destination", help="Output directory, e.g. rf_model.forest")
+    convert_parser.add_argument("--compact", action="store_true",
+                                help="Store float32 thresholds/leaf values and minimal index types")
+    convert_parser.add_argument("--rows", type=int, default=10000,
+                                help="Rows used to measure the compaction's prediction delta")
+
+    report_parser = subparsers.add_parser("report", help="Compare cold-start time and RSS of artifacts")
+    report_parser.add_argument("artifacts", nargs="+", help="Pickle files and/or forest directories")
+    report_parser.add_argument("--rows", type=int, default=1, help="Rows in the first prediction")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "convert":
+        import joblib
+        model = joblib.load(args.source)
+        forest = compile_forest(model)
+        if not isinstance(forest, CompactForest):
+            parser.error(f"{args.source} does not contain a supported forest")
+        if args.compact:
+            compacted = forest.compact()
+            summary = compaction_report(model, forest, compacted, args.rows)
+            print(f"Tree arrays: sklearn {summary['sklearn_mb']:.1f} MB, compiled {summary['compiled_mb']:.1f} MB, "
+                  f"compact {summary['compact_mb']:.1f} MB")
+            print(f"Max prediction delta over {summary['rows']} rows: {summary['max_abs_delta']:.3g} "
+                  f"(relative {summary['max_rel_delta']:.3g})")
+            forest = compacted
+        save_forest(forest, args.destination)
+        print(f"Saved {forest.n_estimators} trees ({forest.n_nodes} nodes) to {args.destination}")
+    else:
+        print(f"{'artifact':<30} {'load s':>10} {'predict s':>10} {'RSS load MB':>12} {'RSS pred MB':>12}")
+        for result in report(args.artifacts, args.rows):
+            load_delta = result["rss_after_load_mb"] - result["rss_baseline_mb"]
+            predict_delta = result["rss_after_predict_mb"] - result["rss_baseline_mb"]
+            print(f"{result['artifact']:<30} {result['load_seconds']:>10.4f} "
+                  f"{result['first_predict_seconds']:>10.4f} {load_delta:>12.1f} {predict_delta:>12.1f}")
+        print("RSS of a memory-mapped forest is file-backed page cache shared by every process mapping it.")
+
+
+if __name__ == "__main__":
+    main()
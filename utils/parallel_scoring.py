@@ -0,0 +1,205 @@
+import functools
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from utils.compact_forest import CompactForest, HybridForest, compile_forest, COMPACT_FOREST_MAX_ROWS
+from utils.data_handler import predict_frame
+
+# Smallest shard worth shipping to a worker; smaller batches score in-process
+MIN_SHARD_SIZE = 5000
+
+# Workers start from a clean interpreter rather than a fork of the (threaded)
+# app process; forkserver where the platform has it, else spawn
+START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+# Node tables copied into shared memory, in layout order
+SHARED_ARRAYS = ["feature", "threshold", "children", "value", "roots", "missing_go_left"]
+
+
+def default_worker_count():
+    """Worker processes to use: BATCH_WORKERS if set, else one per CPU"""
+    return int(os.environ.get("BATCH_WORKERS", os.cpu_count() or 1))
+
+
+def can_score_in_workers(model):
+    """Whether model has a compiled forest the worker processes can share"""
+    forest = model.forest if isinstance(model, HybridForest) else model
+    return isinstance(forest, CompactForest)
+
+
+def shard_size_for(n_rows, n_workers, min_size=MIN_SHARD_SIZE):
+    """Rows per shard so n_rows split evenly across n_workers, but at least min_size"""
+    return max(min_size, -(-n_rows // max(1, n_workers)))
+
+
+def share_forest(forest):
+    """Copy a CompactForest's node tables into one shared memory block
+
+    Returns ``(shm, layout)``; workers rebuild the forest from ``shm.name`` and
+    ``layout`` with attach_forest without any copying. The caller owns the
+    block and must close and unlink it.
+    """
+    entries = []
+    offset = 0
+    for name in SHARED_ARRAYS:
+        array = getattr(forest, name)
+        if array is None:
+            continue
+        # Keep every array 64-byte aligned
+        offset = (offset + 63) // 64 * 64
+        entries.append((name, array.dtype.str, array.shape, offset))
+        offset += array.nbytes
+
+    shm = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+    for name, dtype, shape, start in entries:
+        view = np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=start)
+        view[...] = getattr(forest, name)
+
+    layout = {'arrays': entries, 'n_features': forest.n_features, 'version': forest.version}
+    return shm, layout
+
+
+def attach_forest(shm, layout):
+    """Build a CompactForest whose node tables are views into shared memory"""
+    arrays = {
+        name: np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=start)
+        for name, dtype, shape, start in layout['arrays']
+    }
+    for array in arrays.values():
+        array.flags.writeable = False
+    return CompactForest(
+        arrays['feature'], arrays['threshold'], arrays['children'], arrays['value'],
+        arrays['roots'], layout['n_features'], arrays.get('missing_go_left'),
+        version=layout['version']
+    )
+
+
+# Per-worker state set up once by _init_worker
+_worker_state = {}
+
+def _load_worker_estimator(path):
+    # Memory-mapped node arrays are shared with the other workers through the page cache
+    estimator = joblib.load(path, mmap_mode='r')
+    # Parallelism comes from the pool; one thread per worker avoids oversubscription
+    if hasattr(estimator, 'n_jobs'):
+        estimator.n_jobs = 1
+    return estimator
+
+def _init_worker(shm_name, layout, encoder, scaler, estimator=None, max_rows=COMPACT_FOREST_MAX_ROWS):
+    shm = shared_memory.SharedMemory(name=shm_name)
+    _worker_state['shm'] = shm
+    forest = attach_forest(shm, layout)
+    # Shards above max_rows go to sklearn, like in the app process
+    if isinstance(estimator, str):
+        forest = HybridForest(forest, max_rows=max_rows,
+                              load_estimator=functools.partial(_load_worker_estimator, estimator))
+    elif estimator is not None:
+        if hasattr(estimator, 'n_jobs'):
+            estimator.n_jobs = 1
+        forest = HybridForest(forest, estimator, max_rows)
+    _worker_state['forest'] = forest
+    _worker_state['encoder'] = encoder
+    _worker_state['scaler'] = scaler
+
+def _score_shard(shard, include_confidence):
+    return predict_frame(shard, _worker_state['encoder'], _worker_state['scaler'],
+                         _worker_state['forest'], include_confidence)
+
+
+def _worker_estimator(model):
+    """What workers need to rebuild model's sklearn estimator: a file path, the estimator, or None"""
+    if isinstance(model, HybridForest):
+        return model.estimator_path or model.estimator
+    if isinstance(model, CompactForest):
+        return None
+    return model
+
+
+class ParallelScorer:
+    """Process pool that scores DataFrame shards against a shared-memory forest
+
+    The forest is placed in shared memory once and mapped by every worker;
+    only the encoder, scaler (small) and the input shards are pickled.
+    Shards above COMPACT_FOREST_MAX_ROWS are scored by the sklearn estimator,
+    which workers memory-map from the model's ``estimator_path`` (or receive
+    pickled when there is no file). Use as a context manager so the pool and
+    shared block are released.
+    """
+
+    def __init__(self, encoder, scaler, model, n_workers=None, shard_size=None):
+        forest = compile_forest(model)
+        if not isinstance(forest, CompactForest):
+            raise TypeError(f"Parallel scoring needs a forest model, got {type(model).__name__}")
+
+        self.encoder = encoder
+        self.scaler = scaler
+        # Single-shard frames are scored in this process with the caller's model
+        self.model = model
+        self.n_workers = n_workers or default_worker_count()
+        self.shard_size = shard_size
+        self._shm, layout = share_forest(forest)
+        try:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.n_workers,
+                mp_context=multiprocessing.get_context(START_METHOD),
+                initializer=_init_worker,
+                initargs=(self._shm.name, layout, encoder, scaler, _worker_estimator(model),
+                          getattr(model, 'max_rows', COMPACT_FOREST_MAX_ROWS))
+            )
+        except Exception:
+            self._release_shared_memory()
+            raise
+
+    def predict_frame(self, df, include_confidence=False):
+        """Score df shard by shard across the pool; results keep input order
+
+        Without a fixed shard_size, df is split evenly across the workers.
+        """
+        shard_size = self.shard_size or shard_size_for(len(df), self.n_workers)
+        shards = [df.iloc[start:start + shard_size]
+                  for start in range(0, len(df), shard_size)]
+        if len(shards) <= 1:
+            return predict_frame(df, self.encoder, self.scaler, self.model, include_confidence)
+        # executor.map yields results in submission order
+        results = self._executor.map(_score_shard, shards, [include_confidence] * len(shards))
+        return pd.concat(list(results))
+
+    def _release_shared_memory(self):
+        if self._shm is not None:
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        self._release_shared_memory()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def predict_frame_parallel(df, encoder, scaler, model, n_workers=None,
+                           shard_size=None, include_confidence=False):
+    """Score a DataFrame across worker processes, falling back to one process
+
+    Shards default to an even split across the workers (at least
+    MIN_SHARD_SIZE rows). Uses the current process when only one worker is
+    requested, the frame fits in a single shard, or the model has no compiled
+    forest.
+    """
+    n_workers = n_workers or default_worker_count()
+    shard_size = shard_size or shard_size_for(len(df), n_workers)
+    if n_workers <= 1 or len(df) <= shard_size or not can_score_in_workers(model):
+        return predict_frame(df, encoder, scaler, model, include_confidence)
+
+    with ParallelScorer(encoder, scaler, model, n_workers, shard_size) as scorer:
+        return scorer.predict_frame(df, include_confidence)
@@ -0,0 +1,90 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+class PredictionCache:
+    """Thread-safe LRU cache with optional time-to-live
+
+    Entries are evicted least-recently-used once ``maxsize`` is reached, and
+    treated as missing once older than ``ttl`` seconds (None disables expiry).
+    """
+
+    def __init__(self, maxsize=1024, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        """Return the cached value for key, or None on a miss"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, stored_at = entry
+                if self.ttl is None or time.monotonic() - stored_at <= self.ttl:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+                self.expirations += 1
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        """Store value under key, evicting the least recently used entries if full"""
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (value, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """Drop all entries and reset the counters"""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = self.expirations = 0
+
+    def stats(self):
+        """Return hit/miss counters and current size"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
+
+    def __len__(self):
+        return len(self._entries)
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+def get_prediction_cache():
+    """Return the process-wide prediction cache
+
+    Size and TTL come from PREDICTION_CACHE_SIZE (entries, default 1024) and
+    PREDICTION_CACHE_TTL (seconds, default 3600; 0 disables expiry).
+    """
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            maxsize = int(os.environ.get("PREDICTION_CACHE_SIZE", "1024"))
+            ttl = float(os.environ.get("PREDICTION_CACHE_TTL", "3600")) or None
+            _default_cache = PredictionCache(maxsize=maxsize, ttl=ttl)
+        return _default_cache
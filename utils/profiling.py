@@ -0,0 +1,129 @@
+"""Capture cProfile profiles of whole Streamlit script reruns
+
+``begin_rerun`` and ``end_rerun`` bracket one run of main.py. A capture is
+armed per session with ``arm_capture(state, n)``; each of the next n reruns
+is profiled and written to PROFILE_DIR as a ``.prof`` file that can be
+opened with pstats, snakeviz, or diffed between runs.
+"""
+import cProfile
+import os
+import pstats
+import time
+import uuid
+
+PROFILE_DIR = os.environ.get("PROFILE_DIR", "profiles")
+
+# Components whose functions are summarized separately
+COMPONENT_FILES = {
+    'dashboard': os.path.join("components", "dashboard.py"),
+    'scenario_comparison': os.path.join("components", "scenario_comparison.py"),
+    'batch_processor': os.path.join("components", "batch_processor.py")
+}
+
+# Session state keys
+_REMAINING = "_profile_runs_remaining"
+_ACTIVE = "_profile_active"
+_CAPTURES = "_profile_captures"
+_SESSION = "_profile_session"
+
+
+def is_admin(token):
+    """Return True if token matches PROFILER_ADMIN_TOKEN (unset disables profiling)"""
+    expected = os.environ.get("PROFILER_ADMIN_TOKEN")
+    return bool(expected) and token == expected
+
+
+def arm_capture(state, n_runs):
+    """Profile the next n_runs reruns of this session"""
+    state[_REMAINING] = int(n_runs)
+
+
+def pending_runs(state):
+    return state.get(_REMAINING, 0)
+
+
+def captures(state):
+    """Return the profile files written for this session, oldest first"""
+    return list(state.get(_CAPTURES, []))
+
+
+def begin_rerun(state):
+    """Start profiling this rerun if a capture is armed"""
+    # A rerun cut short by st.rerun()/st.stop() never reached end_rerun
+    if state.get(_ACTIVE) is not None:
+        end_rerun(state, interrupted=True)
+
+    if state.get(_REMAINING, 0) <= 0:
+        return None
+
+    profile = cProfile.Profile()
+    try:
+        profile.enable()
+    except ValueError:
+        # Another session is being profiled (the profiler is process-wide on 3.12+)
+        return None
+    state[_ACTIVE] = (profile, time.time())
+    return profile
+
+
+def end_rerun(state, interrupted=False):
+    """Stop the profile of this rerun and write it to disk; returns its path"""
+    active = state.get(_ACTIVE)
+    if active is None:
+        return None
+    profile, started_at = active
+    profile.disable()
+    state[_ACTIVE] = None
+    state[_REMAINING] = max(0, state.get(_REMAINING, 0) - 1)
+
+    if _SESSION not in state:
+        state[_SESSION] = uuid.uuid4().hex[:8]
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    suffix = "_interrupted" if interrupted else ""
+    stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(started_at))
+    path = os.path.join(PROFILE_DIR, f"rerun_{state[_SESSION]}_{stamp}_{len(captures(state)) + 1}{suffix}.prof")
+    profile.dump_stats(path)
+    state[_CAPTURES] = captures(state) + [path]
+    return path
+
+
+def _function_label(func):
+    filename, line, name = func
+    if os.path.isabs(filename):
+        relative = os.path.relpath(filename)
+        # Outside the app directory (libraries), keep the last path parts
+        filename = relative if not relative.startswith("..") else os.path.join(*filename.split(os.sep)[-3:])
+    return f"{filename}:{line}({name})"
+
+
+def summarize(paths, top=20):
+    """Summarize profiles by cumulative time
+
+    Returns a dict with 'overall' (the top functions across all captures) and
+    one entry per component in COMPONENT_FILES (its own functions). Each is a
+    list of dicts with function, calls, total and cumulative seconds.
+    """
+    paths = [path for path in paths if os.path.exists(path)]
+    if not paths:
+        return {}
+    stats = pstats.Stats(*paths)
+
+    rows = []
+    for func, (_, calls, total_time, cumulative_time, _) in stats.stats.items():
+        rows.append({
+            'function': _function_label(func),
+            'file': func[0],
+            'calls': calls,
+            'total_s': total_time,
+            'cumulative_s': cumulative_time
+        })
+    rows.sort(key=lambda row: row['cumulative_s'], reverse=True)
+
+    def strip(selected):
+        return [{key: row[key] for key in ('function', 'calls', 'total_s', 'cumulative_s')}
+                for row in selected[:top]]
+
+    summary = {'overall': strip(rows)}
+    for component, relative_path in COMPONENT_FILES.items():
+        summary[component] = strip([row for row in rows if row['file'].endswith(relative_path)])
+    return summary
@@ -0,0 +1,281 @@
+"""Mergeable streaming summaries of the prediction distribution
+
+``KLLSketch`` answers quantile queries over any number of values in bounded
+memory (about 3*k retained items) with rank error around 1.7/k; ``FixedHistogram``
+counts values into fixed-width bins. Both update in amortized O(1) and merge
+with summaries built elsewhere, so the distribution tab never touches the
+raw history::
+
+    summary = DistributionSummary()
+    summary.update_many(predictions)
+    summary.quantiles([0.25, 0.5, 0.75])
+    summary.histogram.nonempty()
+"""
+import math
+import random
+import numpy as np
+
+# Sketch accuracy parameter: rank error is roughly 1.7 / k
+DEFAULT_K = 200
+
+# Histogram layout for delivery times in minutes; values outside land in under/overflow
+HISTOGRAM_LOW = 0.0
+HISTOGRAM_HIGH = 120.0
+HISTOGRAM_BIN_WIDTH = 1.0
+
+# Shrink factor of compactor capacities from the top level down
+_CAPACITY_DECAY = 2 / 3
+
+
+class KLLSketch:
+    """KLL quantile sketch (Karnin, Lang and Liberty, 2016)"""
+
+    def __init__(self, k=DEFAULT_K, seed=None):
+        self.k = k
+        self.count = 0
+        self.minimum = math.inf
+        self.maximum = -math.inf
+        # compactors[h] holds items that each stand for 2**h values
+        self.compactors = [[]]
+        self._size = 0
+        self._random = random.Random(seed)
+        self._set_capacities()
+
+    def _set_capacities(self):
+        # Capacities depend only on the number of levels, so recompute when it changes
+        height = len(self.compactors)
+        self._capacities = [max(2, int(math.ceil(self.k * _CAPACITY_DECAY ** (height - level - 1))))
+                            for level in range(height)]
+        self._max_size = sum(self._capacities)
+
+    def _add_level(self):
+        self.compactors.append([])
+        self._set_capacities()
+
+    def update(self, value):
+        value = float(value)
+        self.count += 1
+        self.minimum = min(self.minimum, value)
+        self.maximum = max(self.maximum, value)
+        self.compactors[0].append(value)
+        self._size += 1
+        if self._size >= self._max_size:
+            self._compress()
+
+    def update_many(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        if not len(values):
+            return
+        self.count += len(values)
+        self.minimum = min(self.minimum, float(values.min()))
+        self.maximum = max(self.maximum, float(values.max()))
+        # Fill level 0 up to the size limit at a time, compressing in between
+        values = values.tolist()
+        start = 0
+        while start < len(values):
+            stop = start + max(1, self._max_size - self._size)
+            self.compactors[0].extend(values[start:stop])
+            self._size += len(values[start:stop])
+            start = stop
+            if self._size >= self._max_size:
+                self._compress()
+
+    def _compress(self):
+        while self._size >= self._max_size:
+            for level, items in enumerate(self.compactors):
+                if len(items) >= self._capacities[level]:
+                    if level + 1 == len(self.compactors):
+                        self._add_level()
+                    # Keep every other sorted item at twice the weight; odd leftovers stay
+                    items.sort()
+                    keep_last = items.pop() if len(items) % 2 else None
+                    promoted = items[self._random.randint(0, 1)::2]
+                    self.compactors[level + 1].extend(promoted)
+                    self._size -= len(items) - len(promoted)
+                    self.compactors[level] = [keep_last] if keep_last is not None else []
+                    break
+            else:
+                return
+
+    def state(self):
+        """Return the retained items as JSON-serializable values"""
+        return {'k': self.k, 'count': self.count, 'minimum': self.minimum if self.count else None,
+                'maximum': self.maximum if self.count else None, 'compactors': self.compactors}
+
+    @classmethod
+    def from_state(cls, state):
+        """Rebuild a sketch from state()"""
+        sketch = cls(int(state['k']))
+        sketch.count = int(state['count'])
+        if sketch.count:
+            sketch.minimum = float(state['minimum'])
+            sketch.maximum = float(state['maximum'])
+        sketch.compactors = [[float(value) for value in items] for items in state['compactors']] or [[]]
+        sketch._size = sum(len(items) for items in sketch.compactors)
+        sketch._set_capacities()
+        return sketch
+
+    def merge(self, other):
+        """Fold another sketch into this one"""
+        while len(self.compactors) < len(other.compactors):
+            self._add_level()
+        for level, items in enumerate(other.compactors):
+            self.compactors[level].extend(items)
+        self._size += other._size
+        self.count += other.count
+        self.minimum = min(self.minimum, other.minimum)
+        self.maximum = max(self.maximum, other.maximum)
+        self._compress()
+        return self
+
+    def _weighted_items(self):
+        values = np.concatenate([np.asarray(items, dtype=np.float64) for items in self.compactors])
+        weights = np.concatenate([np.full(len(items), 2 ** level, dtype=np.float64)
+                                  for level, items in enumerate(self.compactors)])
+        order = np.argsort(values, kind='stable')
+        return values[order], np.cumsum(weights[order])
+
+    def quantiles(self, qs):
+        """Return the approximate value at each quantile in qs (0 to 1)"""
+        qs = np.asarray(qs, dtype=np.float64)
+        if not self.count:
+            return np.full(qs.shape, np.nan)
+        values, cumulative = self._weighted_items()
+        index = np.searchsorted(cumulative, qs * cumulative[-1], side='left')
+        result = values[np.minimum(index, len(values) - 1)]
+        # The exact extremes are tracked separately
+        result = np.where(qs <= 0, self.minimum, result)
+        return np.where(qs >= 1, self.maximum, result)
+
+    def quantile(self, q):
+        return float(self.quantiles([q])[0])
+
+    def rank(self, value):
+        """Return the approximate fraction of values at or below value"""
+        if not self.count:
+            return math.nan
+        values, cumulative = self._weighted_items()
+        index = np.searchsorted(values, value, side='right')
+        return float(cumulative[index - 1] / cumulative[-1]) if index else 0.0
+
+    def __len__(self):
+        return self.count
+
+
+class FixedHistogram:
+    """Counts of values in fixed-width bins, plus under/overflow"""
+
+    def __init__(self, low=HISTOGRAM_LOW, high=HISTOGRAM_HIGH, bin_width=HISTOGRAM_BIN_WIDTH):
+        self.low = low
+        self.high = high
+        self.bin_width = bin_width
+        self.counts = np.zeros(int(math.ceil((high - low) / bin_width)), dtype=np.int64)
+        self.underflow = 0
+        self.overflow = 0
+
+    def update(self, value):
+        if value < self.low:
+            self.underflow += 1
+        elif value >= self.high:
+            self.overflow += 1
+        else:
+            self.counts[int((value - self.low) // self.bin_width)] += 1
+
+    def update_many(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        self.underflow += int((values < self.low).sum())
+        self.overflow += int((values >= self.high).sum())
+        inside = values[(values >= self.low) & (values < self.high)]
+        bins = ((inside - self.low) // self.bin_width).astype(np.intp)
+        self.counts += np.bincount(bins, minlength=len(self.counts))
+
+    def state(self):
+        return {'low': self.low, 'high': self.high, 'bin_width': self.bin_width,
+                'counts': self.counts.tolist(), 'underflow': self.underflow, 'overflow': self.overflow}
+
+    @classmethod
+    def from_state(cls, state):
+        histogram = cls(state['low'], state['high'], state['bin_width'])
+        counts = np.asarray(state['counts'], dtype=np.int64)
+        if counts.shape != histogram.counts.shape:
+            raise ValueError("Histogram state does not match its bins")
+        histogram.counts = counts
+        histogram.underflow = int(state['underflow'])
+        histogram.overflow = int(state['overflow'])
+        return histogram
+
+    def merge(self, other):
+        if (other.low, other.high, other.bin_width) != (self.low, self.high, self.bin_width):
+            raise ValueError("Cannot merge histograms with different bins")
+        self.counts += other.counts
+        self.underflow += other.underflow
+        self.overflow += other.overflow
+        return self
+
+    def edges(self):
+        return self.low + self.bin_width * np.arange(len(self.counts) + 1)
+
+    def nonempty(self):
+        """Return (left edges, counts) trimmed to the span of occupied bins"""
+        occupied = np.flatnonzero(self.counts)
+        if not len(occupied):
+            return np.empty(0), np.empty(0, dtype=np.int64)
+        span = slice(occupied[0], occupied[-1] + 1)
+        return self.edges()[:-1][span], self.counts[span]
+
+    def total(self):
+        return int(self.counts.sum()) + self.underflow + self.overflow
+
+
+class DistributionSummary:
+    """Quantile sketch and histogram of predictions, updated together"""
+
+    def __init__(self, k=DEFAULT_K):
+        self.sketch = KLLSketch(k)
+        self.histogram = FixedHistogram()
+
+    def update(self, value):
+        self.sketch.update(value)
+        self.histogram.update(value)
+
+    def update_many(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        self.sketch.update_many(values)
+        self.histogram.update_many(values)
+
+    def state(self):
+        return {'sketch': self.sketch.state(), 'histogram': self.histogram.state()}
+
+    @classmethod
+    def from_state(cls, state):
+        summary = cls()
+        summary.sketch = KLLSketch.from_state(state['sketch'])
+        summary.histogram = FixedHistogram.from_state(state['histogram'])
+        return summary
+
+    def merge(self, other):
+        self.sketch.merge(other.sketch)
+        self.histogram.merge(other.histogram)
+        return self
+
+    def quantiles(self, qs):
+        return self.sketch.quantiles(qs)
+
+    def box_stats(self):
+        """Return quartiles and Tukey whiskers (clipped to the observed range)"""
+        if not self.sketch.count:
+            return {}
+        q1, median, q3 = self.sketch.quantiles([0.25, 0.5, 0.75])
+        iqr = q3 - q1
+        return {
+            'q1': q1,
+            'median': median,
+            'q3': q3,
+            'lower_fence': max(self.sketch.minimum, q1 - 1.5 * iqr),
+            'upper_fence': min(self.sketch.maximum, q3 + 1.5 * iqr),
+            'min': self.sketch.minimum,
+            'max': self.sketch.maximum
+        }
+
+    def __len__(self):
+        return self.sketch.count
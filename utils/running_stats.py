@@ -0,0 +1,255 @@
+"""Running aggregates of predictions, updated in O(1) per prediction
+
+Mean and variance use Welford's update, merged across partitions with Chan's
+formula, so the dashboard's key metrics cost the same at any history size.
+``OnlineCovariance`` extends the same update to a co-moment matrix for the
+correlation heatmap.
+"""
+import math
+import threading
+from collections import deque
+from datetime import datetime
+import numpy as np
+
+# Predictions compared against everything earlier when labelling the trend
+TREND_WINDOW = 5
+
+# Relative variance below which OnlineCovariance treats a variable as constant;
+# rounding leaves about eps * mean^2 per observation in a constant's co-moment
+CONSTANT_TOLERANCE = 1e-12
+
+
+class RunningStats:
+    """Count, mean, variance, min/max, time span and recent window of predictions"""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.total = 0.0
+        self.minimum = math.inf
+        self.maximum = -math.inf
+        self.first_timestamp = None
+        self.last_timestamp = None
+        self.recent = deque(maxlen=TREND_WINDOW)
+        self._lock = threading.Lock()
+
+    def state(self):
+        """Return the aggregates as JSON-serializable values"""
+        with self._lock:
+            if not self.count:
+                return {'count': 0}
+            return {
+                'count': self.count, 'mean': self.mean, 'm2': self.m2, 'total': self.total,
+                'minimum': self.minimum, 'maximum': self.maximum,
+                'first_timestamp': self.first_timestamp.isoformat() if self.first_timestamp else None,
+                'last_timestamp': self.last_timestamp.isoformat() if self.last_timestamp else None,
+                'recent': list(self.recent)
+            }
+
+    @classmethod
+    def from_state(cls, state):
+        """Rebuild stats from state()"""
+        stats = cls()
+        if state['count']:
+            stats.count = int(state['count'])
+            stats.mean = float(state['mean'])
+            stats.m2 = float(state['m2'])
+            stats.total = float(state['total'])
+            stats.minimum = float(state['minimum'])
+            stats.maximum = float(state['maximum'])
+            if state['first_timestamp']:
+                stats.first_timestamp = datetime.fromisoformat(state['first_timestamp'])
+                stats.last_timestamp = datetime.fromisoformat(state['last_timestamp'])
+            stats.recent.extend(float(value) for value in state['recent'])
+        return stats
+
+    def update(self, value, timestamp=None):
+        """Add one prediction"""
+        value = float(value)
+        with self._lock:
+            self.count += 1
+            delta = value - self.mean
+            self.mean += delta / self.count
+            self.m2 += delta * (value - self.mean)
+            self.total += value
+            self.minimum = min(self.minimum, value)
+            self.maximum = max(self.maximum, value)
+            self.recent.append(value)
+            if timestamp is not None:
+                self._update_span(timestamp, timestamp)
+
+    def _update_span(self, first, last):
+        if self.first_timestamp is None or first < self.first_timestamp:
+            self.first_timestamp = first
+        if self.last_timestamp is None or last > self.last_timestamp:
+            self.last_timestamp = last
+
+    def merge(self, other):
+        """Fold another RunningStats into this one (other's values count as older)"""
+        with self._lock:
+            if not other.count:
+                return self
+            count = self.count + other.count
+            delta = other.mean - self.mean
+            self.m2 += other.m2 + delta * delta * self.count * other.count / count
+            self.mean += delta * other.count / count
+            self.count = count
+            self.total += other.total
+            self.minimum = min(self.minimum, other.minimum)
+            self.maximum = max(self.maximum, other.maximum)
+            self.recent = deque(list(other.recent) + list(self.recent), maxlen=TREND_WINDOW)
+            if other.first_timestamp is not None:
+                self._update_span(other.first_timestamp, other.last_timestamp)
+        return self
+
+    @classmethod
+    def from_aggregates(cls, count, mean, variance, minimum, maximum,
+                        first_timestamp=None, last_timestamp=None, recent=()):
+        """Build stats from precomputed aggregates (e.g. a SQL query over stored history)"""
+        stats = cls()
+        if count:
+            stats.count = int(count)
+            stats.mean = float(mean)
+            stats.m2 = float(variance) * stats.count
+            stats.total = stats.mean * stats.count
+            stats.minimum = float(minimum)
+            stats.maximum = float(maximum)
+            stats.first_timestamp = first_timestamp
+            stats.last_timestamp = last_timestamp
+            stats.recent.extend(float(value) for value in recent)
+        return stats
+
+    def variance(self):
+        """Population variance, as np.std reports"""
+        return self.m2 / self.count if self.count else 0.0
+
+    def statistics(self):
+        """Return total_predictions, average_time, std_deviation (population), min_time and max_time"""
+        if not self.count:
+            return {}
+        return {
+            'total_predictions': self.count,
+            'average_time': self.mean,
+            'std_deviation': math.sqrt(max(0.0, self.variance())),
+            'min_time': self.minimum,
+            'max_time': self.maximum
+        }
+
+    def trends(self):
+        """Return the trend (last TREND_WINDOW predictions vs all earlier), mean minutes apart and count"""
+        if self.count < 2:
+            return {}
+
+        if self.count >= TREND_WINDOW:
+            recent_avg = sum(self.recent) / len(self.recent)
+            earlier = self.count - len(self.recent)
+            earlier_avg = (self.total - sum(self.recent)) / earlier if earlier else math.nan
+            trend = "increasing" if recent_avg > earlier_avg else "decreasing"
+        else:
+            trend = "stable"
+
+        # Mean gap between consecutive predictions is the span over count - 1
+        avg_interval = 0
+        if self.first_timestamp is not None:
+            avg_interval = (self.last_timestamp - self.first_timestamp).total_seconds() / 60 / (self.count - 1)
+
+        return {
+            'trend': trend,
+            'average_interval_minutes': avg_interval,
+            'prediction_frequency': self.count
+        }
+
+
+class OnlineCovariance:
+    """Running mean and co-moment matrix of several variables
+
+    With ``half_life`` (in observations) older observations are down-weighted
+    exponentially, so the correlations follow recent traffic. Updates cost
+    O(d^2) for d variables, independent of how many were seen.
+    """
+
+    def __init__(self, names, half_life=None):
+        self.names = list(names)
+        self.half_life = half_life
+        self.decay = 0.5 ** (1 / half_life) if half_life else 1.0
+        self.count = 0
+        self.weight = 0.0
+        self.mean = np.zeros(len(self.names))
+        self.comoment = np.zeros((len(self.names), len(self.names)))
+        self._lock = threading.Lock()
+
+    def state(self):
+        """Return the means and co-moments as JSON-serializable values"""
+        with self._lock:
+            return {
+                'names': self.names, 'half_life': self.half_life, 'count': self.count,
+                'weight': self.weight, 'mean': self.mean.tolist(), 'comoment': self.comoment.tolist()
+            }
+
+    @classmethod
+    def from_state(cls, state):
+        """Rebuild the accumulator from state()"""
+        covariance = cls(state['names'], state['half_life'])
+        covariance.count = int(state['count'])
+        covariance.weight = float(state['weight'])
+        covariance.mean = np.asarray(state['mean'], dtype=np.float64).reshape(len(covariance.names))
+        covariance.comoment = np.asarray(state['comoment'], dtype=np.float64).reshape(
+            len(covariance.names), len(covariance.names))
+        return covariance
+
+    def update(self, values):
+        """Add one observation (a sequence ordered like names)"""
+        x = np.asarray(values, dtype=np.float64)
+        with self._lock:
+            self.weight = self.weight * self.decay + 1.0
+            self.comoment *= self.decay
+            delta = x - self.mean
+            self.mean += delta / self.weight
+            self.comoment += np.outer(delta, x - self.mean)
+            self._symmetrize()
+            self.count += 1
+
+    def update_many(self, rows):
+        """Add a block of observations (rows ordered oldest first) in one merge"""
+        rows = np.asarray(rows, dtype=np.float64).reshape(-1, len(self.names))
+        n = len(rows)
+        if not n:
+            return
+        # Weights of the block as seen after its last row; the block mean and co-moment
+        weights = self.decay ** np.arange(n - 1, -1, -1, dtype=np.float64)
+        block_weight = weights.sum()
+        block_mean = weights @ rows / block_weight
+        centered = rows - block_mean
+        block_comoment = (centered * weights[:, None]).T @ centered
+        with self._lock:
+            # Existing state ages by n observations, then the two are merged
+            old_weight = self.weight * self.decay ** n
+            total = old_weight + block_weight
+            delta = block_mean - self.mean
+            self.comoment = (self.comoment * self.decay ** n + block_comoment
+                             + np.outer(delta, delta) * old_weight * block_weight / total)
+            self.mean = self.mean + delta * block_weight / total
+            self.weight = total
+            self.count += n
+            self._symmetrize()
+
+    def _symmetrize(self):
+        # The outer-product updates are only symmetric up to rounding
+        self.comoment = (self.comoment + self.comoment.T) / 2
+
+    def covariance(self):
+        """Return the (weighted) population covariance matrix"""
+        if not self.weight:
+            return np.full_like(self.comoment, np.nan)
+        return self.comoment / self.weight
+
+    def correlation(self):
+        """Return the correlation matrix; constant variables give NaN like DataFrame.corr"""
+        # A constant's co-moment is rounding noise, not variance
+        diag = np.diag(self.comoment)
+        varying = diag > CONSTANT_TOLERANCE * (self.mean ** 2 + 1) * self.weight
+        scale = np.where(varying, np.sqrt(np.maximum(diag, 0.0)), np.nan)
+        corr = self.comoment / np.outer(scale, scale)
+        np.fill_diagonal(corr, np.where(varying, 1.0, np.nan))
+        return np.clip(corr, -1.0, 1.0)
@@ -0,0 +1,109 @@
+import numpy as np
+import pandas as pd
+
+from utils.analytics import predict_per_tree
+from utils.data_handler import prepare_input_data
+from utils.tracing import traced
+
+# Values swept for each feature, matching the ranges offered by the prediction form
+SWEEP_VALUES = {
+    'distance_km': np.round(np.linspace(1.0, 25.0, 25), 2).tolist(),
+    'order_hour': list(range(7, 24)),
+    'prep_time_min': list(range(5, 21)),
+    'Delivery_person_Age': list(range(21, 51)),
+    'Delivery_person_Ratings': np.round(np.linspace(0.0, 5.0, 26), 1).tolist(),
+    'multiple_deliveries': list(range(0, 5)),
+    'Vehicle_condition': list(range(0, 3)),
+    'order_day': list(range(0, 7)),
+    'is_weekend': [0, 1],
+    'Weatherconditions': ["Sunny", "Stormy", "Sandstorms", "Windy", "Cloudy", "Fog"],
+    'Road_traffic_density': ["Low", "Medium", "High", "Jam"],
+    'Type_of_order': ["Snack", "Meal", "Drinks", "Buffet"],
+    'Type_of_vehicle': ["Motorcycle", "Scooter", "Electric Bike", "Bicycle"],
+    'Festival': ["No", "Yes"],
+    'City': ["Metropolitan", "Urban", "Semi-Urban"]
+}
+
+FEATURE_LABELS = {
+    'distance_km': "Distance (km)",
+    'order_hour': "Order Hour",
+    'prep_time_min': "Prep Time (min)",
+    'Delivery_person_Age': "Age",
+    'Delivery_person_Ratings': "Rating",
+    'multiple_deliveries': "Multiple Deliveries",
+    'Vehicle_condition': "Vehicle Condition",
+    'order_day': "Day of Week",
+    'is_weekend': "Weekend",
+    'Weatherconditions': "Weather",
+    'Road_traffic_density': "Traffic",
+    'Type_of_order': "Order Type",
+    'Type_of_vehicle': "Vehicle Type",
+    'Festival': "Festival",
+    'City': "City"
+}
+
+
+def build_sweep_frame(order, features=None):
+    """Stack the order and every one-feature variant of it into one frame
+
+    Row 0 is the unchanged order; each feature then contributes one row per
+    swept value. Returns ``(frame, segments)`` where segments maps each feature
+    to its ``(start, stop)`` row range.
+    """
+    features = list(SWEEP_VALUES) if features is None else features
+    base = order.iloc[[0]].reset_index(drop=True)
+
+    sizes = [len(SWEEP_VALUES[feature]) for feature in features]
+    frame = base.loc[np.zeros(1 + sum(sizes), dtype=int)].reset_index(drop=True)
+
+    segments = {}
+    start = 1
+    for feature, size in zip(features, sizes):
+        stop = start + size
+        # Object column so numeric and label sweeps can share the frame
+        frame[feature] = frame[feature].astype(object)
+        frame.loc[start:stop - 1, feature] = SWEEP_VALUES[feature]
+        segments[feature] = (start, stop)
+        start = stop
+    return frame, segments
+
+
+def _predict(model, final_input, n_trees):
+    if n_trees is None:
+        return model.predict(final_input)
+    if hasattr(model, 'predict_per_tree'):
+        return model.predict(final_input, n_trees=n_trees)
+    return predict_per_tree(model, final_input, n_trees=n_trees).mean(axis=0)
+
+
+@traced()
+def sensitivity_curves(order, encoder, scaler, model, features=None, n_trees=None):
+    """Return the model's prediction as each feature sweeps its range
+
+    All variants are encoded and scored in one vectorized call. Returns a dict
+    with 'baseline' (the order's own prediction) and 'curves', mapping each
+    feature to a DataFrame of 'value', 'prediction' and 'delta' (change from
+    the baseline, in minutes).
+    """
+    frame, segments = build_sweep_frame(order, features)
+    final_input = prepare_input_data(frame, encoder, scaler)
+    predictions = np.asarray(_predict(model, final_input, n_trees), dtype=np.float64)
+    baseline = float(predictions[0])
+
+    curves = {}
+    for feature, (start, stop) in segments.items():
+        curves[feature] = pd.DataFrame({
+            'value': SWEEP_VALUES[feature],
+            'prediction': predictions[start:stop],
+            'delta': predictions[start:stop] - baseline
+        })
+    return {'baseline': baseline, 'curves': curves}
+
+
+def feature_impact(sensitivity):
+    """Return each feature's prediction swing (max - min over its sweep), largest first"""
+    impact = {
+        feature: float(curve['prediction'].max() - curve['prediction'].min())
+        for feature, curve in sensitivity['curves'].items()
+    }
+    return dict(sorted(impact.items(), key=lambda item: item[1], reverse=True))
@@ -0,0 +1,148 @@
+"""Lightweight timing spans for prediction requests
+
+Spans are only recorded while a Tracer is active, so instrumented functions
+cost one context-variable lookup otherwise::
+
+    tracer = Tracer("single_prediction")
+    with tracer.activate():
+        with span("make_prediction"):
+            ...
+    tracer.summary()          # per-span durations
+    tracer.to_chrome_trace()  # load in chrome://tracing or ui.perfetto.dev
+"""
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from utils.metrics import STAGE_LATENCY
+
+_active_tracer = contextvars.ContextVar("active_tracer", default=None)
+
+
+class Tracer:
+    """Collects nested timing spans for one request"""
+
+    def __init__(self, name="request"):
+        self.name = name
+        self.spans = []
+        self._depth = 0
+        self._origin = time.perf_counter()
+        self.started_at = time.time()
+
+    @contextmanager
+    def activate(self):
+        """Make this tracer receive spans opened in the current context"""
+        token = _active_tracer.set(self)
+        self._origin = time.perf_counter()
+        self.started_at = time.time()
+        try:
+            with self.span(self.name):
+                yield self
+        finally:
+            _active_tracer.reset(token)
+
+    @contextmanager
+    def span(self, name, **args):
+        record = {'name': name, 'depth': self._depth, 'args': args,
+                  'start': time.perf_counter() - self._origin, 'duration': None}
+        self.spans.append(record)
+        self._depth += 1
+        try:
+            yield record
+        finally:
+            self._depth -= 1
+            record['duration'] = time.perf_counter() - self._origin - record['start']
+
+    def total_seconds(self):
+        finished = [s['duration'] for s in self.spans if s['depth'] == 0 and s['duration'] is not None]
+        return sum(finished)
+
+    def summary(self):
+        """Return one row per span: name, depth, start/duration in ms and share of the request"""
+        total = self.total_seconds() or 1.0
+        return [
+            {
+                'Stage': ("  " * s['depth']) + s['name'],
+                'Start (ms)': s['start'] * 1000,
+                'Duration (ms)': (s['duration'] or 0.0) * 1000,
+                'Share (%)': (s['duration'] or 0.0) / total * 100
+            }
+            for s in self.spans
+        ]
+
+    def to_chrome_trace(self):
+        """Return the spans as Chrome trace-event JSON ("X" complete events)"""
+        pid = os.getpid()
+        tid = threading.get_ident()
+        origin_us = self.started_at * 1e6
+        events = [
+            {
+                'name': s['name'],
+                'cat': 'prediction',
+                'ph': 'X',
+                'ts': origin_us + s['start'] * 1e6,
+                'dur': (s['duration'] or 0.0) * 1e6,
+                'pid': pid,
+                'tid': tid,
+                'args': {key: str(value) for key, value in s['args'].items()}
+            }
+            for s in self.spans
+        ]
+        return json.dumps({'traceEvents': events, 'displayTimeUnit': 'ms'})
+
+
+def current_tracer():
+    """Return the tracer active in this context, or None"""
+    return _active_tracer.get()
+
+
+@contextmanager
+def _no_span():
+    yield None
+
+
+def span(name, **args):
+    """Time a block under the active tracer; does nothing when none is active"""
+    tracer = _active_tracer.get()
+    if tracer is None:
+        return _no_span()
+    return tracer.span(name, **args)
+
+
+@contextmanager
+def trace_request(name, enabled=True):
+    """Trace a block with a fresh Tracer, yielding it (or None when disabled)"""
+    if not enabled:
+        yield None
+        return
+    tracer = Tracer(name)
+    with tracer.activate():
+        yield tracer
+
+
+def traced(name=None):
+    """Decorator recording each call of a function as a span
+
+    Every call is also observed in the stage latency histogram of utils.metrics.
+    """
+    def decorator(func):
+        span_name = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            tracer = _active_tracer.get()
+            start = time.perf_counter()
+            try:
+                if tracer is None:
+                    return func(*args, **kwargs)
+                with tracer.span(span_name):
+                    return func(*args, **kwargs)
+            finally:
+                # Stage latency is always exported, traced or not
+                STAGE_LATENCY.observe(time.perf_counter() - start, stage=span_name)
+        return wrapper
+    return decorator
@@ -3,58 +3,80 @@ import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import pandas as pd
 import numpy as np
+from utils.sensitivity import FEATURE_LABELS, feature_impact
+from utils.tracing import traced
 
-def create_prediction_charts(prediction_record):
-    """Create various charts for prediction analysis"""
-    data = prediction_record['input_data']
-    prediction = prediction_record['prediction']
-    
-    # Factor impact chart
-    factors = {
-        'Distance': data['distance_km'].iloc[0],
-        'Prep Time': data['prep_time_min'].iloc[0],
-        'Age': data['Delivery_person_Age'].iloc[0],
-        'Rating': data['Delivery_person_Ratings'].iloc[0],
-        'Multiple Deliveries': data['multiple_deliveries'].iloc[0],
-        'Vehicle Condition': data['Vehicle_condition'].iloc[0]
-    }
-    
-    # Normalize factors for visualization
-    normalized_factors = {}
-    for key, value in factors.items():
-        if key == 'Distance':
-            normalized_factors[key] = min(value / 30.0, 1.0) * 100
-        elif key == 'Prep Time':
-            normalized_factors[key] = min(value / 60.0, 1.0) * 100
-        elif key == 'Age':
-            normalized_factors[key] = min(value / 60.0, 1.0) * 100
-        elif key == 'Rating':
-            normalized_factors[key] = (value / 5.0) * 100
-        elif key == 'Multiple Deliveries':
-            normalized_factors[key] = min(value / 4.0, 1.0) * 100
-        elif key == 'Vehicle Condition':
-            normalized_factors[key] = (value / 2.0) * 100
+@traced()
+def create_prediction_charts(prediction_record, sensitivity):
+    """Create charts showing how the model's prediction responds to each factor
+
+    ``sensitivity`` is the result of utils.sensitivity.sensitivity_curves for
+    the recorded order.
+    """
+    # Factor impact: how far the prediction moves as each factor sweeps its range
+    impact = feature_impact(sensitivity)
+    labels = [FEATURE_LABELS.get(feature, feature) for feature in impact]
     
     fig = go.Figure()
     
     fig.add_trace(go.Bar(
-        x=list(normalized_factors.keys()),
-        y=list(normalized_factors.values()),
-        marker_color=['#FF6B6B', '#4ECDC4', '#45B7D1', '#96CEB4', '#FFEAA7', '#DDA0DD'],
-        text=[f"{v:.1f}%" for v in normalized_factors.values()],
+        x=labels,
+        y=list(impact.values()),
+        marker_color='#4ECDC4',
+        text=[f"{v:.1f} min" for v in impact.values()],
         textposition='auto',
     ))
     
     fig.update_layout(
-        title="Factor Impact on Delivery Time",
+        title="Factor Impact on Delivery Time (prediction swing over each factor's range)",
         xaxis_title="Factors",
-        yaxis_title="Impact Level (%)",
+        yaxis_title="Swing (minutes)",
         template="plotly_white",
         height=400
     )
     
-    return {'factor_impact': fig}
+    return {'factor_impact': fig, 'sensitivity': create_sensitivity_chart(prediction_record, sensitivity)}
 
+@traced()
+def create_sensitivity_chart(prediction_record, sensitivity, cols=3):
+    """Create one small panel per factor with the model's prediction across its range"""
+    curves = sensitivity['curves']
+    features = list(curves)
+    rows = -(-len(features) // cols)
+    fig = make_subplots(
+        rows=rows, cols=cols,
+        subplot_titles=[FEATURE_LABELS.get(feature, feature) for feature in features]
+    )
+    
+    data = prediction_record['input_data']
+    for i, feature in enumerate(features):
+        row, col = i // cols + 1, i % cols + 1
+        curve = curves[feature]
+        if curve['value'].map(lambda value: isinstance(value, str)).any():
+            # Categorical factor: highlight the order's own value
+            current = str(data[feature].iloc[0]).strip().lower()
+            colors = ['#FF6B6B' if str(value).strip().lower() == current else '#45B7D1'
+                      for value in curve['value']]
+            fig.add_trace(go.Bar(x=curve['value'], y=curve['prediction'], marker_color=colors,
+                                 name=feature, showlegend=False), row=row, col=col)
+        else:
+            fig.add_trace(go.Scatter(x=curve['value'], y=curve['prediction'], mode='lines+markers',
+                                     line=dict(color='#45B7D1'), marker=dict(size=4),
+                                     name=feature, showlegend=False), row=row, col=col)
+            fig.add_trace(go.Scatter(x=[data[feature].iloc[0]], y=[sensitivity['baseline']],
+                                     mode='markers', marker=dict(color='#FF6B6B', size=9),
+                                     name='Current Order', showlegend=False), row=row, col=col)
+    
+    fig.update_yaxes(title_text="min")
+    fig.update_layout(
+        title="Prediction Sensitivity by Factor",
+        template="plotly_white",
+        height=260 * rows
+    )
+    
+    return fig
+
+@traced()
 def create_factor_analysis(data):
     """Create factor analysis visualization"""
     # Create a radar chart for categorical factors
@@ -69,13 +91,21 @@ def create_factor_analysis(data):
     festival_scores = {'no': 5, 'yes': 2}
 
     
+    # Normalize categorical values
+    weather = str(data['Weatherconditions'].iloc[0]).strip().lower()
+    traffic = str(data['Road_traffic_density'].iloc[0]).strip().lower()
+    order_type = str(data['Type_of_order'].iloc[0]).strip().lower()
+    vehicle = str(data['Type_of_vehicle'].iloc[0]).strip().lower()
+    city = str(data['City'].iloc[0]).strip().lower()
+    festival = str(data['Festival'].iloc[0]).strip().lower()
+    
     values = [
-        weather_scores.get(data['Weatherconditions'].iloc[0], 3),
-        traffic_scores.get(data['Road_traffic_density'].iloc[0], 3),
-        order_scores.get(data['Type_of_order'].iloc[0], 3),
-        vehicle_scores.get(data['Type_of_vehicle'].iloc[0], 3),
-        city_scores.get(data['City'].iloc[0], 3),
-        festival_scores.get(data['Festival'].iloc[0], 3)
+        weather_scores.get(weather, 3),
+        traffic_scores.get(traffic, 3),
+        order_scores.get(order_type, 3),
+        vehicle_scores.get(vehicle, 3),
+        city_scores.get(city, 3),
+        festival_scores.get(festival, 3)
     ]
     
     fig = go.Figure()
@@ -161,13 +191,12 @@ def create_batch_analysis_chart(batch_results):
     
     return fig
 
-def create_time_series_chart(history_data):
-    """Create time series chart for prediction history"""
-    if not history_data:
+def create_time_series_chart(timeline):
+    """Create time series chart from the downsampled prediction timeline"""
+    if not len(timeline):
         return None
     
-    timestamps = [record['timestamp'] for record in history_data]
-    predictions = [record['prediction'] for record in history_data]
+    _, timestamps, predictions = timeline.series('prediction')
     
     fig = go.Figure()
     